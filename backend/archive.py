@@ -0,0 +1,180 @@
+"""
+Columnar archive of price ticks.
+
+Closed days of price_ticks are written to one zstd-compressed Parquet file
+per day (ARCHIVE_DIR/ticks/YYYY-MM-DD.parquet), sorted by symbol, exchange
+and timestamp so row-group statistics let readers skip everything but the
+requested series. load_ticks() reads them back as NumPy arrays (or a pandas
+DataFrame) without touching the database, for research and multi-month
+scans.
+
+When enabled (PRICE_ARCHIVE_ENABLED=true), the archive is also the cold tier
+for retention: days are archived before retention.py prunes them, and
+pruning never passes the first day that has not been archived.
+
+A day is archived once, so it must be complete first: it is held back for
+ARCHIVE_GRACE_SECONDS after midnight (batches still in the tick writer's
+queue) and for as long as the spool holds snapshots of it or an earlier day
+(a database outage, replayed whenever the database is back, however long
+that takes).
+
+Requires pyarrow, which is not in requirements.txt (pip install pyarrow;
+numpy comes with it, pandas only for as_pandas=True).
+"""
+
+import os
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func
+
+from models import SessionLocal, PriceTick
+from spool import spool
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    ARCHIVE_AVAILABLE = True
+except ImportError:
+    ARCHIVE_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# On the data volume, outside the (bind-mounted) source tree
+ARCHIVE_DIR = os.getenv("PRICE_ARCHIVE_DIR", os.path.join(os.getenv("DATA_DIR", "/data"), "archive"))
+# Archive closed days (and hold back retention until they are archived); opt-in
+ARCHIVE_REQUESTED = os.getenv("PRICE_ARCHIVE_ENABLED", "false").lower() == "true"
+ARCHIVE_ENABLED = ARCHIVE_REQUESTED and ARCHIVE_AVAILABLE
+if ARCHIVE_REQUESTED and not ARCHIVE_AVAILABLE:
+    logger.warning("PRICE_ARCHIVE_ENABLED is set but pyarrow is not installed; the price archive is disabled")
+
+# Seconds after midnight before the previous day counts as closed
+ARCHIVE_GRACE_SECONDS = int(os.getenv("PRICE_ARCHIVE_GRACE_SECONDS", "900"))
+
+COMPRESSION = "zstd"
+ROW_GROUP_SIZE = 64 * 1024
+
+
+def _require_pyarrow():
+    if not ARCHIVE_AVAILABLE:
+        raise RuntimeError("The price archive requires pyarrow (pip install pyarrow)")
+
+
+def _day_start(value):
+    return datetime(value.year, value.month, value.day)
+
+
+def day_path(day, archive_dir=None):
+    return os.path.join(archive_dir or ARCHIVE_DIR, "ticks", f"{day:%Y-%m-%d}.parquet")
+
+
+def is_archived(day, archive_dir=None):
+    return os.path.exists(day_path(day, archive_dir))
+
+
+def archive_day(day, archive_dir=None):
+    """Write one day of ticks to its Parquet file; returns the number of ticks written"""
+    _require_pyarrow()
+    day = _day_start(day)
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(PriceTick.symbol, PriceTick.exchange, PriceTick.timestamp, PriceTick.price)
+            .where(PriceTick.timestamp >= day, PriceTick.timestamp < day + timedelta(days=1))
+            .order_by(PriceTick.symbol, PriceTick.exchange, PriceTick.timestamp)
+        ).all()
+    finally:
+        db.close()
+
+    symbols, exchanges, timestamps, prices = zip(*rows) if rows else ((), (), (), ())
+    table = pa.table({
+        "symbol": pa.array(symbols, pa.string()).dictionary_encode(),
+        "exchange": pa.array(exchanges, pa.string()).dictionary_encode(),
+        "timestamp": pa.array(timestamps, pa.timestamp("us")),
+        "price": pa.array(prices, pa.float64()),
+    })
+
+    path = day_path(day, archive_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a temporary file first so a crash never leaves a truncated day behind
+    tmp_path = path + ".tmp"
+    pq.write_table(table, tmp_path, compression=COMPRESSION, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp_path, path)
+    return len(rows)
+
+
+def _oldest_tick_day():
+    db = SessionLocal()
+    try:
+        oldest = db.execute(select(func.min(PriceTick.timestamp))).scalar()
+    finally:
+        db.close()
+    return _day_start(oldest) if oldest else None
+
+
+def _complete_before():
+    """Start of the first day that may still receive ticks (late batches or the spool)"""
+    limit = _day_start(datetime.now() - timedelta(seconds=ARCHIVE_GRACE_SECONDS))
+    spooled = spool.oldest_timestamp()
+    if spooled is not None:
+        limit = min(limit, _day_start(spooled))
+    return limit
+
+
+def archive_closed_days(archive_dir=None):
+    """Archive every complete day that has ticks but no file yet"""
+    _require_pyarrow()
+    day = _oldest_tick_day()
+    limit = _complete_before()
+    archived = 0
+    while day is not None and day < limit:
+        if not is_archived(day, archive_dir):
+            count = archive_day(day, archive_dir)
+            logger.info(f"Archived {count} ticks of {day:%Y-%m-%d} to {day_path(day, archive_dir)}")
+            archived += 1
+        day += timedelta(days=1)
+    return archived
+
+
+def archived_cutoff(cutoff, archive_dir=None):
+    """Latest prune cutoff <= cutoff that only removes days already in the archive"""
+    day = _oldest_tick_day()
+    while day is not None and day < cutoff:
+        if not is_archived(day, archive_dir):
+            return min(cutoff, day)
+        day += timedelta(days=1)
+    return cutoff
+
+
+def load_ticks(symbol, exchange, start=None, end=None, archive_dir=None, as_pandas=False):
+    """
+    Archived ticks of one symbol on one exchange in [start, end].
+    Returns (timestamps, prices) as numpy datetime64[us] / float64 arrays,
+    or a DataFrame indexed by timestamp with as_pandas=True.
+    """
+    _require_pyarrow()
+    directory = os.path.join(archive_dir or ARCHIVE_DIR, "ticks")
+    paths = []
+    if os.path.isdir(directory):
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(".parquet"):
+                continue
+            day = datetime.strptime(name[:-len(".parquet")], "%Y-%m-%d")
+            if (start is None or day + timedelta(days=1) > start) and (end is None or day <= end):
+                paths.append(os.path.join(directory, name))
+
+    filters = [("symbol", "=", symbol.upper()), ("exchange", "=", exchange)]
+    if start is not None:
+        filters.append(("timestamp", ">=", start))
+    if end is not None:
+        filters.append(("timestamp", "<=", end))
+
+    tables = [pq.read_table(path, columns=["timestamp", "price"], filters=filters) for path in paths]
+    if tables:
+        table = pa.concat_tables(tables)
+    else:
+        table = pa.table({"timestamp": pa.array([], pa.timestamp("us")), "price": pa.array([], pa.float64())})
+
+    if as_pandas:
+        return table.to_pandas().set_index("timestamp")
+    return table.column("timestamp").to_numpy(), table.column("price").to_numpy()
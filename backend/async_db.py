@@ -0,0 +1,66 @@
+"""
+Async database access for the API endpoints.
+
+The hot read endpoints (market data, prices, trade log) use an AsyncSession
+on an async engine built from DATABASE_URL (asyncpg for PostgreSQL,
+aiosqlite for SQLite), so concurrent requests wait on pooled connections
+instead of occupying Starlette's threadpool. The sync engine and SessionLocal
+in models.py stay in use for the scheduler, the tick writer and scripts.
+
+Helpers written against a sync Session (tick_store, rollups) are reused via
+AsyncSession.run_sync, which runs them on the async connection without a
+thread.
+"""
+
+import os
+import logging
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from models import SQLALCHEMY_DATABASE_URL, SQLITE_TUNED, apply_sqlite_pragmas
+
+logger = logging.getLogger(__name__)
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", "10"))       # Bounds concurrent API queries (PostgreSQL)
+MAX_OVERFLOW = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "10"))
+
+
+def async_url(url):
+    """DATABASE_URL with its driver swapped for the async one (postgresql+psycopg2 -> postgresql+asyncpg)"""
+    url = make_url(url)
+    backend = url.drivername.split("+")[0]
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {url.drivername}")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_url(SQLALCHEMY_DATABASE_URL)
+
+if make_url(ASYNC_DATABASE_URL).drivername.startswith("sqlite"):
+    async_engine = create_async_engine(ASYNC_DATABASE_URL)
+    if SQLITE_TUNED:
+        event.listen(async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+else:
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, pool_pre_ping=True
+    )
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+async def get_db():
+    """FastAPI dependency: one AsyncSession per request"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def dispose():
+    await async_engine.dispose()
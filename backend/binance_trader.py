@@ -1,14 +1,9 @@
 import time
 import hmac
 import hashlib
-import requests
-import urllib3
 from urllib.parse import urlencode
 
-# Disable SSL warnings
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
-BASE_URL = "https://api.binance.com"
+from exchange_client import request as exchange_request
 
 def get_signature(params, secret_key):
     # Build query string from params (sorted by key recommended but not strictly required if consistent)
@@ -33,14 +28,13 @@ def send_signed_request(method, endpoint, api_key, secret_key, params=None):
         'X-MBX-APIKEY': api_key
     }
     
-    url = f"{BASE_URL}{endpoint}"
-    
     try:
         if method == "GET":
-            response = requests.get(url, params=params, headers=headers, verify=False)
+            # Signed private calls keep the static timeout and are never hedged
+            response = exchange_request("binance", "GET", endpoint, idempotent=False, params=params, headers=headers)
         elif method == "POST":
             # Binance allows parameters in query string for POST
-            response = requests.post(url, params=params, headers=headers, verify=False)
+            response = exchange_request("binance", "POST", endpoint, params=params, headers=headers)
         
         # Check for HTTP errors
         if response.status_code >= 400:
@@ -0,0 +1,111 @@
+"""
+Top coins universe (CoinGecko top 30 by market cap).
+
+Callers never wait on CoinGecko: get() always returns the current list
+immediately (the last good list, or DEFAULT_COINS) and, when it is older than
+COINS_REFRESH_SECONDS, starts a single background refresh. Only one refresh
+runs at a time no matter how many ingestion ticks or /api/coins requests see
+the stale list. The last good list is stored in the cached_values table and
+loaded at startup, so a restart serves the previous universe right away.
+"""
+
+import threading
+import logging
+from datetime import datetime
+
+from models import SessionLocal, WriteSession, CachedValue
+from exchange_client import request as exchange_request
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = "top_coins"
+
+COINS_REFRESH_SECONDS = 3600
+# After a failed refresh, wait this long before trying again
+COINS_RETRY_SECONDS = 60
+
+DEFAULT_COINS = [
+    {"symbol": "BTC", "name": "Bitcoin"}, {"symbol": "ETH", "name": "Ethereum"},
+    {"symbol": "XRP", "name": "XRP"}, {"symbol": "SOL", "name": "Solana"},
+    {"symbol": "USDT", "name": "Tether"}, {"symbol": "DOGE", "name": "Dogecoin"}
+]
+
+
+def fetch_top_coins():
+    params = {
+        "vs_currency": "usd",
+        "order": "market_cap_desc",
+        "per_page": 30,
+        "page": 1,
+        "sparkline": "false"
+    }
+    response = exchange_request("coingecko", "GET", "/api/v3/coins/markets", params=params)
+    if response.status_code != 200:
+        raise RuntimeError(f"CoinGecko returned {response.status_code}")
+    return [
+        {"symbol": coin["symbol"].upper(), "name": coin["name"], "id": coin["id"]}
+        for coin in response.json()
+    ]
+
+
+class CoinUniverse:
+    def __init__(self):
+        self._coins = None
+        self._updated_at = datetime.min
+        self._last_attempt = datetime.min
+        self._refresh_lock = threading.Lock()
+
+    def load(self):
+        """Load the last good list from the database; call once at startup"""
+        db = SessionLocal()
+        try:
+            row = db.get(CachedValue, CACHE_KEY)
+            if row and row.value:
+                self._coins = row.value
+                self._updated_at = row.updated_at or datetime.min
+                logger.info(f"Loaded {len(self._coins)} top coins from database (updated {self._updated_at})")
+        except Exception as e:
+            logger.error(f"Could not load persisted top coins: {e}")
+        finally:
+            db.close()
+
+    def _save(self, coins, updated_at):
+        db = WriteSession()
+        try:
+            db.merge(CachedValue(key=CACHE_KEY, value=coins, updated_at=updated_at))
+            db.commit()
+        except Exception as e:
+            logger.error(f"Could not persist top coins: {e}")
+        finally:
+            db.close()
+
+    def refresh(self):
+        """Fetch from CoinGecko unless a refresh is already running (single-flight)"""
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_attempt = datetime.now()
+            coins = fetch_top_coins()
+            if not coins:
+                return
+            self._coins, self._updated_at = coins, datetime.now()
+            logger.info(f"Updated top 30 coins cache: {[c['symbol'] for c in coins]}")
+            self._save(coins, self._updated_at)
+        except Exception as e:
+            logger.error(f"Error fetching top coins: {e}")
+        finally:
+            self._refresh_lock.release()
+
+    def _is_stale(self):
+        now = datetime.now()
+        return ((now - self._updated_at).total_seconds() >= COINS_REFRESH_SECONDS
+                and (now - self._last_attempt).total_seconds() >= COINS_RETRY_SECONDS)
+
+    def get(self):
+        """Current coin list; never blocks on the network"""
+        if self._is_stale() and not self._refresh_lock.locked():
+            threading.Thread(target=self.refresh, name="coin-universe-refresh", daemon=True).start()
+        return self._coins or DEFAULT_COINS
+
+
+coin_universe = CoinUniverse()
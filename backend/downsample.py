@@ -0,0 +1,44 @@
+"""
+Largest-Triangle-Three-Buckets downsampling for chart series.
+
+LTTB keeps the first and last point and, for each of the threshold - 2
+buckets in between, the point forming the largest triangle with the point
+kept from the previous bucket and the average of the next bucket. Peaks and
+dips survive far better than with plain striding or averaging.
+"""
+
+
+def lttb(xs, ys, threshold):
+    """Indices of at most threshold points of the series (xs ascending)"""
+    n = len(xs)
+    if threshold >= n or threshold <= 0:
+        return list(range(n))
+    if threshold < 3:
+        return [0, n - 1][:threshold]
+
+    kept = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket (the last point for the final bucket)
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        if next_start >= next_end:
+            next_start, next_end = n - 1, n
+        count = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / count
+        avg_y = sum(ys[next_start:next_end]) / count
+
+        # Point of the current bucket with the largest triangle
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = xs[a], ys[a]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        kept.append(best)
+        a = best
+    kept.append(n - 1)
+    return kept
@@ -0,0 +1,185 @@
+"""
+Shared exchange HTTP client layer.
+
+One pooled keep-alive client per exchange for the whole process, so balance
+checks, orders and ingestion reuse open connections instead of paying a new
+TCP + TLS handshake per call. HTTP/2 is offered via ALPN when the h2 package
+is installed; exchanges that do not speak it fall back to HTTP/1.1.
+
+Calls should go through request() / async_request(), which apply the
+exchange's resilience guard (adaptive timeouts, hedging, circuit breaker).
+Sync clients are used by the trader modules; async clients are used by the
+ingestion engine and must be requested on its event loop.
+"""
+
+import os
+import threading
+import logging
+
+import time
+
+import httpx
+
+from resilience import ExchangeGuard, CircuitOpenError
+from metrics import EXCHANGE_REQUEST_SECONDS, EXCHANGE_REQUEST_FAILURES, register_circuit
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# TLS verification was historically disabled for all exchange calls
+VERIFY_TLS = os.getenv("EXCHANGE_VERIFY_TLS", "false").lower() == "true"
+
+# Per-exchange endpoints and timeouts (seconds)
+#   connect_timeout/read_timeout: static timeouts, used as-is for non-idempotent calls (orders)
+#   initial_timeout:              idempotent calls before enough latency samples exist
+#   min_timeout/max_timeout:      bounds for the adaptive (p99-based) timeout
+EXCHANGES = {
+    "bithumb": {"base_url": "https://api.bithumb.com", "connect_timeout": 3, "read_timeout": 10,
+                "initial_timeout": 3, "min_timeout": 0.5, "max_timeout": 5},
+    "binance": {"base_url": "https://api.binance.com", "connect_timeout": 3, "read_timeout": 10,
+                "initial_timeout": 5, "min_timeout": 1, "max_timeout": 8},
+    "korbit": {"base_url": "https://api.korbit.co.kr", "connect_timeout": 3, "read_timeout": 5,
+               "initial_timeout": 3, "min_timeout": 0.5, "max_timeout": 5},
+    "fx_rate": {"base_url": "https://api.frankfurter.app", "connect_timeout": 3, "read_timeout": 5,
+                "initial_timeout": 5, "min_timeout": 1, "max_timeout": 5},
+    "fx_rate_backup": {"base_url": "https://open.er-api.com", "connect_timeout": 3, "read_timeout": 5,
+                       "initial_timeout": 5, "min_timeout": 1, "max_timeout": 5},
+    "coingecko": {"base_url": "https://api.coingecko.com", "connect_timeout": 3, "read_timeout": 10,
+                  "initial_timeout": 10, "min_timeout": 2, "max_timeout": 10},
+}
+
+POOL_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60)
+
+_lock = threading.Lock()
+_sync_clients = {}
+_async_clients = {}
+
+guards = {
+    name: ExchangeGuard(name, config["initial_timeout"], config["min_timeout"], config["max_timeout"])
+    for name, config in EXCHANGES.items()
+}
+for _name, _guard in guards.items():
+    register_circuit(_name, _guard)
+
+
+def _client_options(exchange):
+    config = EXCHANGES[exchange]
+    return {
+        "base_url": config["base_url"],
+        "timeout": httpx.Timeout(config["read_timeout"], connect=config["connect_timeout"]),
+        "limits": POOL_LIMITS,
+        "http2": HTTP2_AVAILABLE,
+        "verify": VERIFY_TLS,
+    }
+
+
+def get_client(exchange):
+    """Process-wide sync client for an exchange"""
+    client = _sync_clients.get(exchange)
+    if client is None:
+        with _lock:
+            client = _sync_clients.get(exchange)
+            if client is None:
+                client = httpx.Client(**_client_options(exchange))
+                _sync_clients[exchange] = client
+    return client
+
+
+def get_async_client(exchange):
+    """Async client for an exchange; only call from the ingestion event loop"""
+    client = _async_clients.get(exchange)
+    if client is None:
+        client = httpx.AsyncClient(**_client_options(exchange))
+        _async_clients[exchange] = client
+    return client
+
+
+def _is_adaptive(method, idempotent, timeout):
+    if idempotent is None:
+        idempotent = method.upper() == "GET"
+    return idempotent and timeout is None
+
+
+def _timeout_kwarg(adaptive_timeout, timeout):
+    if adaptive_timeout is not None:
+        return adaptive_timeout
+    return httpx.USE_CLIENT_DEFAULT if timeout is None else timeout
+
+
+def _failure_reason(response=None, error=None):
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(error, httpx.TimeoutException):
+        return "timeout"
+    if error is not None:
+        return "error"
+    if response.status_code == 429:
+        return "rate_limited"
+    if response.status_code >= 500:
+        return "server_error"
+    return None
+
+
+def _observe(exchange, start, response=None, error=None):
+    if not isinstance(error, CircuitOpenError):
+        EXCHANGE_REQUEST_SECONDS.labels(exchange).observe(time.perf_counter() - start)
+    reason = _failure_reason(response, error)
+    if reason:
+        EXCHANGE_REQUEST_FAILURES.labels(exchange, reason).inc()
+
+
+def request(exchange, method, url, idempotent=None, timeout=None, **kwargs):
+    """
+    Guarded sync request. Idempotent calls (GETs by default) get the adaptive
+    timeout and hedging unless an explicit timeout is given; other calls use
+    timeout or the exchange's static default and are never hedged.
+    Raises resilience.CircuitOpenError while the exchange's breaker is open.
+    """
+    client = get_client(exchange)
+    start = time.perf_counter()
+    try:
+        response = guards[exchange].call_sync(
+            lambda adaptive_timeout: client.request(method, url, timeout=_timeout_kwarg(adaptive_timeout, timeout), **kwargs),
+            adaptive=_is_adaptive(method, idempotent, timeout),
+        )
+    except Exception as e:
+        _observe(exchange, start, error=e)
+        raise
+    _observe(exchange, start, response)
+    return response
+
+
+async def async_request(exchange, method, url, idempotent=None, timeout=None, **kwargs):
+    """Guarded async request; see request()"""
+    client = get_async_client(exchange)
+    start = time.perf_counter()
+    try:
+        response = await guards[exchange].call_async(
+            lambda adaptive_timeout: client.request(method, url, timeout=_timeout_kwarg(adaptive_timeout, timeout), **kwargs),
+            adaptive=_is_adaptive(method, idempotent, timeout),
+        )
+    except Exception as e:
+        _observe(exchange, start, error=e)
+        raise
+    _observe(exchange, start, response)
+    return response
+
+
+async def aclose_async_clients():
+    clients = list(_async_clients.values())
+    _async_clients.clear()
+    for client in clients:
+        await client.aclose()
+
+
+def close_clients():
+    with _lock:
+        clients = list(_sync_clients.values())
+        _sync_clients.clear()
+    for client in clients:
+        client.close()
@@ -0,0 +1,133 @@
+"""
+USD/KRW rate provider.
+
+The official rate changes at most daily, so it is fetched on a slow background
+job (FX_RATE_TTL_SECONDS) from the first source in FX_SOURCES that answers, and
+the last good rate is stored in the cached_values table so a restart starts
+with it. current() never touches the network; its fallback order is:
+  1. the official rate, if fetched within FX_RATE_MAX_AGE_SECONDS
+  2. a live rate derived from Bithumb USDT/KRW (includes the KRW premium)
+  3. the last official rate of any age
+  4. DEFAULT_USD_KRW_RATE
+"""
+
+import threading
+import logging
+from datetime import datetime
+
+from models import SessionLocal, WriteSession, CachedValue
+from ingestion import engine as ingestion_engine, get_json
+from market_state import market_state
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = "usd_krw_rate"
+
+DEFAULT_USD_KRW_RATE = 1300.0
+
+# Re-fetch the official rate once it is older than this
+FX_RATE_TTL_SECONDS = 3600
+# Beyond this the official rate is considered outdated and the Bithumb-derived rate is preferred
+FX_RATE_MAX_AGE_SECONDS = 2 * 24 * 3600
+# Bithumb USDT/KRW is only used while this fresh
+DERIVED_RATE_MAX_AGE_SECONDS = 60
+# Anything below this is not a plausible USD/KRW price
+MIN_PLAUSIBLE_RATE = 1000
+
+FX_FETCH_TIMEOUT = 6
+
+
+async def fetch_frankfurter_rate():
+    data = await get_json("fx_rate", "/latest", "Exchange rate", params={"from": "USD", "to": "KRW"})
+    if isinstance(data, dict) and "KRW" in data.get("rates", {}):
+        return data["rates"]["KRW"]
+    return None
+
+
+async def fetch_er_api_rate():
+    data = await get_json("fx_rate_backup", "/v6/latest/USD", "Exchange rate (backup)")
+    if isinstance(data, dict) and data.get("result") == "success" and "KRW" in data.get("rates", {}):
+        return data["rates"]["KRW"]
+    return None
+
+
+# Tried in order until one returns a rate
+FX_SOURCES = [
+    ("frankfurter", fetch_frankfurter_rate),
+    ("open.er-api", fetch_er_api_rate),
+]
+
+
+class FxRateProvider:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rate = None
+        self._source = None
+        self._updated_at = None
+
+    def _set(self, rate, source, updated_at):
+        with self._lock:
+            self._rate, self._source, self._updated_at = rate, source, updated_at
+
+    def age_seconds(self):
+        with self._lock:
+            updated = self._updated_at
+        return None if updated is None else (datetime.now() - updated).total_seconds()
+
+    def load(self):
+        """Load the last good official rate from the database; call once at startup"""
+        db = SessionLocal()
+        try:
+            row = db.get(CachedValue, CACHE_KEY)
+            if row and row.value and row.value.get("rate"):
+                self._set(row.value["rate"], row.value.get("source"), row.updated_at)
+                logger.info(f"Loaded USD/KRW rate {row.value['rate']} from database (updated {row.updated_at})")
+        except Exception as e:
+            logger.error(f"Could not load persisted USD/KRW rate: {e}")
+        finally:
+            db.close()
+
+    def _save(self, rate, source, updated_at):
+        db = WriteSession()
+        try:
+            db.merge(CachedValue(key=CACHE_KEY, value={"rate": rate, "source": source}, updated_at=updated_at))
+            db.commit()
+        except Exception as e:
+            logger.error(f"Could not persist USD/KRW rate: {e}")
+        finally:
+            db.close()
+
+    def refresh(self, force=False):
+        """Background job: fetch the official rate if the cached one has expired"""
+        age = self.age_seconds()
+        if not force and age is not None and age < FX_RATE_TTL_SECONDS:
+            return
+        for source, fetch in FX_SOURCES:
+            try:
+                rate = ingestion_engine.run(fetch, timeout=FX_FETCH_TIMEOUT)
+            except Exception as e:
+                logger.warning(f"USD/KRW source {source} failed: {type(e).__name__}: {e}")
+                continue
+            if rate and rate > MIN_PLAUSIBLE_RATE:
+                now = datetime.now()
+                self._set(rate, source, now)
+                self._save(rate, source, now)
+                logger.info(f"Updated USD/KRW rate from {source}: {rate}")
+                return
+        logger.warning("No USD/KRW source answered; keeping the previous rate")
+
+    def derived_rate(self):
+        """USD/KRW derived from the live Bithumb USDT/KRW price, or None"""
+        price = market_state.latest_price("bithumb", "USDT", max_age=DERIVED_RATE_MAX_AGE_SECONDS)
+        return price if price and price > MIN_PLAUSIBLE_RATE else None
+
+    def current(self):
+        """Best available rate right now; never blocks on the network"""
+        with self._lock:
+            rate, updated = self._rate, self._updated_at
+        if rate and (datetime.now() - updated).total_seconds() <= FX_RATE_MAX_AGE_SECONDS:
+            return rate
+        return self.derived_rate() or rate or DEFAULT_USD_KRW_RATE
+
+
+fx_rate_provider = FxRateProvider()
@@ -0,0 +1,66 @@
+"""
+HTTP conditional caching of the market data endpoints.
+
+/api/prices, /api/market/current and /api/market/history only change when a
+new snapshot is published or a PriceLog row is committed, so their ETag is
+derived from price_snapshot.version() (the id of the newest committed row
+plus a change counter, kept in memory) and the path and query parameters. A
+request whose If-None-Match carries the current tag gets a 304 before any
+query runs. The counter restarts with the process, so the hash also covers a
+per-process token.
+
+The tag is taken before the response is built: if a flush lands in between,
+the body is newer than its tag and the next request simply gets a 200, never
+a stale 304. While the process is cold (no row seen yet) responses carry no
+validator.
+
+Cache-Control lets a shared cache (reverse proxy) serve a response to every
+user for SHARED_MAX_AGE seconds and revalidate it with the tag afterwards;
+browsers revalidate on every request.
+"""
+
+import os
+import hashlib
+
+from fastapi import Response
+
+from price_snapshot import price_snapshot
+
+SHARED_MAX_AGE = int(os.getenv("HTTP_CACHE_SHARED_MAX_AGE", "2"))  # Seconds, keep below the persist interval
+CACHE_CONTROL = f"public, max-age=0, s-maxage={SHARED_MAX_AGE}"
+_PROCESS_TOKEN = os.urandom(8).hex()  # Tags of an earlier process never match
+
+
+def etag(request):
+    """Strong ETag of the response to request under the current price_snapshot version, or None while cold"""
+    version = price_snapshot.version()
+    if version is None:
+        return None
+    latest_id, changes = version
+    params = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    digest = hashlib.blake2b(f"{_PROCESS_TOKEN}:{request.url.path}?{params}".encode(), digest_size=8).hexdigest()
+    return f'"{latest_id or 0}.{changes}-{digest}"'
+
+
+def not_modified(request, tag):
+    """304 response if If-None-Match matches tag, else None"""
+    header = request.headers.get("if-none-match")
+    if tag is None or not header:
+        return None
+    # Weak comparison (RFC 9110), proxies may weaken tags of compressed responses
+    candidates = {candidate.strip().removeprefix("W/") for candidate in header.split(",")}
+    if tag in candidates or "*" in candidates:
+        return Response(status_code=304, headers=headers(tag))
+    return None
+
+
+def headers(tag):
+    """Validator and caching headers for a response tagged tag"""
+    if tag is None:
+        return {}
+    return {"ETag": tag, "Cache-Control": CACHE_CONTROL}
+
+
+def apply(response, tag):
+    response.headers.update(headers(tag))
+    return response
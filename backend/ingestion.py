@@ -0,0 +1,156 @@
+"""
+Asyncio market-data ingestion engine.
+
+Exchange tickers are fetched on one long-lived event loop over the pooled
+keep-alive clients from exchange_client. Each exchange runs as its own
+ingestion job (see scheduler.py), so a slow exchange never delays the others.
+"""
+
+import asyncio
+import json
+import threading
+import logging
+
+from exchange_client import async_request, aclose_async_clients
+from resilience import CircuitOpenError
+from listings import symbol_listings
+
+logger = logging.getLogger(__name__)
+# httpx logs every request at INFO, which floods the log at 1s ingestion cadences
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# Timeouts, hedging and retries are handled by each exchange's resilience guard
+# (see resilience.py and exchange_client.EXCHANGES)
+
+
+class IngestionEngine:
+    """Owns the event loop thread that all ingestion coroutines run on"""
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._loop is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="ingestion-loop", daemon=True)
+            self._thread.start()
+            logger.info("Ingestion event loop started")
+
+    def stop(self):
+        with self._lock:
+            if self._loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(aclose_async_clients(), self._loop).result(timeout=5)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop = None
+            self._thread = None
+
+    @property
+    def loop(self):
+        self.start()
+        return self._loop
+
+    def run(self, coro_factory, timeout=None):
+        """
+        Run coro_factory() on the engine loop and wait for its result.
+        The coroutine is cancelled if it exceeds timeout (asyncio.TimeoutError).
+        """
+        self.start()
+
+        async def runner():
+            return await asyncio.wait_for(coro_factory(), timeout)
+
+        future = asyncio.run_coroutine_threadsafe(runner(), self._loop)
+        return future.result()
+
+
+engine = IngestionEngine()
+
+
+async def get_json(exchange, url, name, raise_circuit_open=False, **kwargs):
+    """Guarded GET. Returns parsed JSON or None (CircuitOpenError is re-raised if raise_circuit_open)."""
+    try:
+        response = await async_request(exchange, "GET", url, **kwargs)
+        return response.json()
+    except CircuitOpenError as e:
+        if raise_circuit_open:
+            raise
+        logger.debug(f"Skipping {name} fetch: {e}")
+    except Exception as e:
+        logger.warning(f"Error fetching {name} prices: {type(e).__name__}: {e}")
+    return None
+
+
+async def fetch_bithumb_price(symbol):
+    """Fetch price for a single symbol from Bithumb. Returns None on failure."""
+    data = await get_json("bithumb", f"/public/ticker/{symbol}_KRW", f"Bithumb {symbol}")
+    if isinstance(data, dict) and data.get("status") == "0000":
+        return float(data["data"]["closing_price"])
+    return None
+
+
+async def fetch_bithumb_all_prices():
+    """
+    Fetch every KRW market from Bithumb in one request. Returns None on failure;
+    raises CircuitOpenError while Bithumb's breaker is open.
+    """
+    data = await get_json("bithumb", "/public/ticker/ALL_KRW", "Bithumb ALL_KRW", raise_circuit_open=True)
+    if not isinstance(data, dict) or data.get("status") != "0000":
+        logger.warning("Bithumb ALL_KRW fetch failed, falling back to per-symbol requests")
+        return None
+    prices = {}
+    for symbol, ticker in data["data"].items():
+        # The payload also carries a top-level 'date' entry
+        if isinstance(ticker, dict) and "closing_price" in ticker:
+            prices[symbol] = float(ticker["closing_price"])
+    return prices
+
+
+async def fetch_bithumb_prices(symbols):
+    """Returns None if Bithumb could not be reached"""
+    try:
+        all_prices = await fetch_bithumb_all_prices()
+    except CircuitOpenError as e:
+        # Per-symbol requests would only be rejected by the same breaker
+        logger.debug(f"Skipping Bithumb fetch: {e}")
+        return None
+    if all_prices is not None:
+        return {symbol: all_prices.get(symbol, 0.0) for symbol in symbols}
+
+    # Fallback: one request per symbol
+    prices = await asyncio.gather(*(fetch_bithumb_price(symbol) for symbol in symbols))
+    if all(price is None for price in prices):
+        return None
+    return {symbol: 0.0 if price is None else price for symbol, price in zip(symbols, prices)}
+
+
+async def fetch_binance_prices(symbols):
+    """Returns None if Binance could not be reached"""
+    data = None
+    if symbols and symbol_listings.is_known("binance"):
+        # Only ask for listed pairs; an unknown pair would fail the whole request
+        pairs = json.dumps([f"{symbol}USDT" for symbol in symbols], separators=(",", ":"))
+        data = await get_json("binance", "/api/v3/ticker/price", "Binance", params={"symbols": pairs})
+    if not isinstance(data, list):
+        data = await get_json("binance", "/api/v3/ticker/price", "Binance")
+    if not isinstance(data, list):
+        return None
+    binance_map = {item['symbol']: float(item['price']) for item in data if item['symbol'].endswith('USDT')}
+    return {symbol: binance_map.get(f"{symbol}USDT", 0.0) for symbol in symbols}
+
+
+async def fetch_korbit_prices(symbols):
+    """Returns None if Korbit could not be reached"""
+    data = await get_json("korbit", "/v1/ticker/detailed/all", "Korbit")
+    if not isinstance(data, dict):
+        return None
+    prices = {}
+    for symbol in symbols:
+        key = f"{symbol.lower()}_krw"
+        prices[symbol] = float(data[key].get('last', 0)) if key in data else 0.0
+    return prices
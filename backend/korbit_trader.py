@@ -1,20 +1,15 @@
 import time
 import hmac
 import hashlib
-import requests
-import urllib3
 from urllib.parse import urlencode
 import logging
 
+from exchange_client import request as exchange_request
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Disable SSL warnings
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
-BASE_URL = "https://api.korbit.co.kr"
-
 def get_signature(query_string, secret_key):
     return hmac.new(
         secret_key.encode('utf-8'),
@@ -38,7 +33,7 @@ def get_korbit_balance(api_key, secret_key):
     # 3. Append Signature to Query String
     final_query = f"{query_string}&signature={signature}"
     
-    url = f"{BASE_URL}{endpoint}?{final_query}"
+    url = f"{endpoint}?{final_query}"
     
     headers = {
         "X-KAPI-KEY": api_key,
@@ -47,7 +42,8 @@ def get_korbit_balance(api_key, secret_key):
     
     try:
         # Pass None to params since we appended it to url manually
-        response = requests.get(url, headers=headers, verify=False, timeout=5)
+        # Signed private calls keep the static timeout and are never hedged
+        response = exchange_request("korbit", "GET", url, idempotent=False, headers=headers)
         
         if response.status_code != 200:
             logger.error(f"Korbit API Error: {response.status_code} {response.text}")
@@ -89,7 +85,6 @@ def get_korbit_balance(api_key, secret_key):
 
 def place_korbit_order(api_key, secret_key, symbol, side, price, qty, order_type="limit"):
     endpoint = "/v2/orders"
-    url = f"{BASE_URL}{endpoint}"
     
     # Symbol format: btc_krw
     symbol = symbol.lower()
@@ -124,7 +119,7 @@ def place_korbit_order(api_key, secret_key, symbol, side, price, qty, order_type
     }
     
     try:
-        response = requests.post(url, data=final_body, headers=headers, verify=False, timeout=5)
+        response = exchange_request("korbit", "POST", endpoint, content=final_body, headers=headers)
         return response.json()
     except Exception as e:
         logger.error(f"Korbit Order Error: {e}")
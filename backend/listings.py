@@ -0,0 +1,79 @@
+"""
+Per-exchange symbol-listing index (negative cache).
+
+Built from each exchange's market list and refreshed on a slow schedule.
+Ingestion skips symbols an exchange is known not to list, and the persist
+stage records them as not listed (None) instead of a 0.0 price.
+Until an exchange's index has loaded, every symbol is treated as listed.
+"""
+
+import threading
+import logging
+from datetime import datetime
+
+from exchange_client import async_request
+
+logger = logging.getLogger(__name__)
+
+# Market lists change rarely; refresh hourly
+LISTINGS_REFRESH_SECONDS = 3600
+LISTINGS_TIMEOUT = 10
+
+
+async def fetch_bithumb_listing():
+    response = await async_request("bithumb", "GET", "/v1/market/all", timeout=LISTINGS_TIMEOUT)
+    return {item["market"].split("-", 1)[1] for item in response.json() if item.get("market", "").startswith("KRW-")}
+
+
+async def fetch_binance_listing():
+    response = await async_request(
+        "binance", "GET", "/api/v3/exchangeInfo", params={"symbolStatus": "TRADING"}, timeout=LISTINGS_TIMEOUT
+    )
+    return {item["baseAsset"] for item in response.json()["symbols"] if item.get("quoteAsset") == "USDT"}
+
+
+async def fetch_korbit_listing():
+    response = await async_request("korbit", "GET", "/v1/ticker/detailed/all", timeout=LISTINGS_TIMEOUT)
+    return {key.split("_")[0].upper() for key in response.json() if key.endswith("_krw")}
+
+
+LISTING_FETCHERS = {
+    "bithumb": fetch_bithumb_listing,
+    "binance": fetch_binance_listing,
+    "korbit": fetch_korbit_listing,
+}
+
+
+class SymbolListings:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listed = {}
+        self._refreshed_at = {}
+
+    def update(self, exchange, symbols):
+        with self._lock:
+            self._listed[exchange] = frozenset(symbols)
+            self._refreshed_at[exchange] = datetime.now()
+
+    def is_known(self, exchange):
+        """True once the exchange's market list has been loaded"""
+        with self._lock:
+            return exchange in self._listed
+
+    def listed(self, exchange, symbols):
+        """Subset of symbols that are (or may be) listed on exchange"""
+        with self._lock:
+            listed = self._listed.get(exchange)
+        if listed is None:
+            return list(symbols)
+        return [s for s in symbols if s in listed]
+
+    def unlisted(self, exchange, symbols):
+        with self._lock:
+            listed = self._listed.get(exchange)
+        if listed is None:
+            return set()
+        return {s for s in symbols if s not in listed}
+
+
+symbol_listings = SymbolListings()
@@ -1,23 +1,42 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime, timedelta
 import logging
-
-from models import Base, engine, SessionLocal, PriceLog, TradeLog, APIKey, User, init_db
-from scheduler import start_scheduler, get_top_30_coins
+import time
+
+from models import Base, engine, SessionLocal, TradeLog, APIKey, User
+from scheduler import start_scheduler, scheduler
+from tick_writer import tick_writer
+from coin_universe import coin_universe
+from market_state import market_state, EXCHANGES
+from ingestion import engine as ingestion_engine
+from exchange_client import close_clients
 from trader import place_order, get_balance
 from binance_trader import place_binance_order, get_binance_balance
 from korbit_trader import get_korbit_balance, place_korbit_order
 from routers import auth
+import async_db
+import schema_migrations
+import tick_store
+from price_snapshot import price_snapshot
+import price_stream
+import http_cache
+import rollups
+import metrics
 from auth import get_current_user
 
 # Logging setup
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+LATEST_ID_HEADER = "X-Latest-Id"  # Newest row id in a history/trades response, the next since_id
+
 app = FastAPI(
     title="Bithumb Trading API",
     docs_url="/api/docs",
@@ -39,8 +58,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[LATEST_ID_HEADER, "ETag"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template (/api/keys/{key_id}), not raw path, to bound cardinality
+    route = request.scope.get("route")
+    metrics.HTTP_REQUEST_SECONDS.labels(
+        request.method, route.path if route else "unmatched", response.status_code
+    ).observe(time.perf_counter() - start)
+    return response
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -49,11 +80,25 @@ def get_db():
     finally:
         db.close()
 
+# Ingested prices younger than this (REST jobs or WebSocket streams) are preferred
+# over the last persisted snapshot when sizing and pricing orders
+LIVE_PRICE_MAX_AGE_SECONDS = 10
+
+def live_price(exchange, coin, fallback):
+    # fallback may be None for coins the exchange does not list
+    return market_state.latest_price(exchange, coin.upper(), max_age=LIVE_PRICE_MAX_AGE_SECONDS) or fallback or 0
+
 # Health check endpoint (used by container/ops to verify service availability)
 @app.get("/api/health")
 def health():
     return {"status": "ok"}
 
+@app.get("/api/metrics")
+def get_metrics():
+    """Prometheus scrape endpoint"""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
 # Pydantic Models
 class TradeRequest(BaseModel):
     key_id: int
@@ -77,33 +122,201 @@ class KeyResponse(BaseModel):
 # Startup Event
 @app.on_event("startup")
 def on_startup():
-    init_db()
+    # Migrations run before the app starts (migrations/upgrade.py); only verify here
+    version = schema_migrations.check()
     start_scheduler()
-    logger.info("Database initialized and Scheduler started.")
+    logger.info(f"Database schema at version {version}, scheduler started.")
+
+@app.on_event("shutdown")
+def on_shutdown():
+    scheduler.shutdown(wait=False)
+    tick_writer.stop()
+    ingestion_engine.stop()
+    close_clients()
+
+@app.on_event("shutdown")
+async def close_async_db():
+    await async_db.dispose()
 
 # Endpoints
 
 @app.get("/api/market/current")
-def get_current_market(db: Session = Depends(get_db)):
+async def get_current_market(request: Request, db: AsyncSession = Depends(async_db.get_db)):
+    tag = http_cache.etag(request)
+    not_modified = http_cache.not_modified(request, tag)
+    if not_modified is not None:
+        return not_modified
     try:
-        # Use primary key ordering to avoid issues when system clock drifts
-        latest = db.query(PriceLog).order_by(PriceLog.id.desc()).first()
-        if not latest:
+        # In-memory snapshot; the database is only read while it is cold
+        published = price_snapshot.published() or await db.run_sync(price_snapshot.load)
+        if not published:
             return {"btc_price": 0, "usd_krw_rate": 0, "timestamp": None}
-        return latest
+        return Response(content=published.current_body, media_type="application/json", headers=http_cache.headers(tag))
     except Exception as e:
         logger.error(f"Error in get_current_market: {e}")
         return {"btc_price": 0, "usd_krw_rate": 0, "timestamp": None}
 
+MAX_HISTORY_SYMBOLS = 20
+MAX_HISTORY_POINTS = 5000
+
+def chart_range(start, end, max_points):
+    """Validated [start, end] (default: the last 24 hours) for chart endpoints"""
+    end = end or datetime.now()
+    start = start or end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if max_points <= 0:
+        raise HTTPException(status_code=400, detail="max_points must be positive")
+    return start, end
+
 @app.get("/api/market/history")
-def get_market_history(limit: int = 100, db: Session = Depends(get_db)):
-    # Get last N records by insertion order to avoid timestamp ordering issues
-    history = db.query(PriceLog).order_by(PriceLog.id.desc()).limit(limit).all()
-    return list(reversed(history)) # Return in chronological order
+async def get_market_history(
+    request: Request,
+    response: Response,
+    limit: int = 100,
+    since_id: Optional[int] = None,
+    symbols: Optional[str] = None,
+    exchanges: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    since_ts: Optional[int] = None,
+    max_points: int = rollups.DEFAULT_MAX_POINTS,
+    resolution: Optional[str] = None,
+    db: AsyncSession = Depends(async_db.get_db),
+):
+    """
+    Without symbols: the last limit snapshots in the legacy shape (every coin);
+    with since_id (delta fetch) the first limit snapshots with a larger id.
+
+    With symbols (comma-separated, e.g. BTC,ETH) and optionally exchanges
+    (default: all): column arrays per (symbol, exchange) over [start, end]
+    (default: the last 24 hours), each downsampled to max_points with LTTB:
+    {start, end, resolution, latest_id, series: [{symbol, exchange, t: [epoch ms], p: [price]}]}
+    resolution (raw, 1m, ...) fixes the resolution instead of choosing it from
+    the range. since_ts (epoch ms, the last t a client has) requires the
+    resolution of the response being extended and replaces start: raw returns
+    only later ticks, candle resolutions start at the candle holding since_ts,
+    so the still-open candle is sent again with its latest close.
+
+    The X-Latest-Id header carries the id to pass as since_id next time.
+    """
+    tag = http_cache.etag(request)
+    not_modified = http_cache.not_modified(request, tag)
+    if not_modified is not None:
+        return not_modified
+    http_cache.apply(response, tag)
+    if symbols is None:
+        # Last N snapshots by insertion order, returned in chronological order
+        history = await db.run_sync(tick_store.history, limit, since_id)
+        latest_id = history[-1]["id"] if history else since_id
+        if latest_id is not None:
+            response.headers[LATEST_ID_HEADER] = str(latest_id)
+        return history
+
+    symbol_list = [symbol.strip().upper() for symbol in symbols.split(",") if symbol.strip()]
+    exchange_list = [name.strip().lower() for name in exchanges.split(",") if name.strip()] if exchanges else list(EXCHANGES)
+    if not symbol_list or len(symbol_list) > MAX_HISTORY_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"symbols must list 1 to {MAX_HISTORY_SYMBOLS} coins")
+    unknown = [name for name in exchange_list if name not in EXCHANGES]
+    if unknown or not exchange_list:
+        raise HTTPException(status_code=400, detail=f"exchanges must be among: {', '.join(EXCHANGES)}")
+    if resolution is not None and resolution != rollups.RAW and resolution not in rollups.RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of: {rollups.RAW}, {', '.join(rollups.RESOLUTIONS)}")
+    if since_ts is not None:
+        # The delta's range is shorter than the original one: choosing again would switch resolution
+        if resolution is None:
+            raise HTTPException(status_code=400, detail="since_ts requires the resolution of the series being extended")
+        if resolution == rollups.RAW:
+            # t values are truncated to the millisecond: start just after it
+            start = datetime.fromtimestamp((since_ts + 1) / 1000)
+        else:
+            start = rollups.bucket_start(datetime.fromtimestamp(since_ts / 1000), rollups.RESOLUTIONS[resolution])
+    start, end = chart_range(start, end, max_points)
+    max_points = min(max_points, MAX_HISTORY_POINTS)
+    if resolution is not None and rollups.point_count(start, end, resolution) > max_points * rollups.SERIES_OVERSAMPLE:
+        raise HTTPException(status_code=400, detail=f"{resolution} over this range is too fine; use a coarser resolution or a shorter range")
+    latest_id = await db.run_sync(tick_store.latest_id)
+    resolution, series = await db.run_sync(
+        rollups.series, symbol_list, exchange_list, start, end, max_points, resolution
+    )
+    if latest_id is not None:
+        response.headers[LATEST_ID_HEADER] = str(latest_id)
+    return {"start": start, "end": end, "resolution": resolution, "latest_id": latest_id, "series": series}
+
+@app.get("/api/market/candles")
+async def get_market_candles(
+    symbol: str = "BTC",
+    exchange: str = "bithumb",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    max_points: int = rollups.DEFAULT_MAX_POINTS,
+    resolution: Optional[str] = None,
+    db: AsyncSession = Depends(async_db.get_db),
+):
+    """
+    OHLC candles of one coin on one exchange. Without resolution, the finest
+    resolution whose point count over [start, end] fits max_points is used
+    (raw ticks for short ranges). Defaults to the last 24 hours. An explicit
+    resolution that would exceed max_points (at most MAX_HISTORY_POINTS) is
+    rejected.
+    """
+    exchange = exchange.strip().lower()
+    if exchange not in EXCHANGES:
+        raise HTTPException(status_code=400, detail=f"exchange must be one of: {', '.join(EXCHANGES)}")
+    start, end = chart_range(start, end, max_points)
+    max_points = min(max_points, MAX_HISTORY_POINTS)
+    if resolution is None:
+        resolution = rollups.choose_resolution(start, end, max_points)
+    elif resolution != rollups.RAW and resolution not in rollups.RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of: {rollups.RAW}, {', '.join(rollups.RESOLUTIONS)}")
+    elif rollups.point_count(start, end, resolution) > max_points:
+        raise HTTPException(status_code=400, detail=f"{resolution} over this range exceeds {max_points} points; use a coarser resolution or a shorter range")
+    return {
+        "symbol": symbol.upper(),
+        "exchange": exchange,
+        "resolution": resolution,
+        "candles": await db.run_sync(rollups.candles, symbol, exchange, start, end, resolution),
+    }
+
+@app.get("/api/stream")
+async def stream_market():
+    """
+    Server-Sent Events:
+    - "price": the /api/market/current snapshot as soon as it is taken (id null
+      until stored), also while the database is down
+    - "tick": every stored snapshot, in price log id order (SSE id = its id)
+    - "backfill": {first_id, last_id, count} instead of ticks for a large
+      flush (spool replay); fetch them with /api/market/history?since_id=
+    - "trade": one /api/trades row after every executed trade
+    Starts with the current snapshot as a "price" event.
+    """
+    # Subscribe before reading the snapshot, so nothing published in between is missed
+    subscriber = price_stream.broker.subscribe()
+    published = price_snapshot.published()
+    initial = [price_stream.frame("price", published.current_body)] if published else []
+    return StreamingResponse(
+        price_stream.broker.events(subscriber, initial),
+        media_type="text/event-stream",
+        # No proxy buffering or caching of the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.get("/api/trades")
-def get_trades(db: Session = Depends(get_db)):
-    trades = db.query(TradeLog).order_by(TradeLog.timestamp.desc()).limit(50).all()
+async def get_trades(response: Response, since_id: Optional[int] = None, db: AsyncSession = Depends(async_db.get_db)):
+    """
+    Last 50 trades, newest first. With since_id (delta fetch) the first 50
+    trades with a larger id, oldest first, so chaining on X-Latest-Id never
+    skips any.
+    """
+    if since_id is None:
+        query = select(TradeLog).order_by(TradeLog.timestamp.desc())
+    else:
+        query = select(TradeLog).where(TradeLog.id > since_id).order_by(TradeLog.id)
+    result = await db.execute(query.limit(50))
+    trades = result.scalars().all()
+    latest_id = max((trade.id for trade in trades), default=since_id)
+    if latest_id is not None:
+        response.headers[LATEST_ID_HEADER] = str(latest_id)
     return trades
 
 @app.post("/api/trade")
@@ -119,7 +332,8 @@ def execute_trade(request: TradeRequest, db: Session = Depends(get_db), current_
     # Execute Trade
     try:
         # Get Current Price for Volume Calculation (Sell) or Logging
-        latest_price = db.query(PriceLog).order_by(PriceLog.timestamp.desc()).first()
+        latest_price = price_snapshot.get(db)
+        latest_price = latest_price.snapshot if latest_price else None
         
         response = {}
         exec_price = 0.0
@@ -128,14 +342,7 @@ def execute_trade(request: TradeRequest, db: Session = Depends(get_db), current_
 
         if exchange == 'binance':
             # Binance Logic
-            binance_price_map = {
-                "BTC": latest_price.btc_binance,
-                "ETH": latest_price.eth_binance,
-                "XRP": latest_price.xrp_binance,
-                "SOL": latest_price.sol_binance,
-                "DOGE": latest_price.doge_binance,
-            }
-            current_price = binance_price_map.get(request.coin.upper(), 0)
+            current_price = live_price('binance', request.coin, tick_store.snapshot_price(latest_price, 'binance', request.coin))
             if current_price <= 0:
                 raise HTTPException(status_code=400, detail="Current Binance price unavailable")
             
@@ -151,14 +358,15 @@ def execute_trade(request: TradeRequest, db: Session = Depends(get_db), current_
             
             logger.info(f"Binance Order Request: Coin={request.coin}, Side={request.side}, Amount={request.amount} USDT, CalcQty={trade_qty}")
             
-            response = place_binance_order(
-                key.api_key,
-                key.api_secret,
-                request.coin,
-                "BUY" if request.side == 'bid' else "SELL",
-                trade_qty,
-                "MARKET"
-            )
+            with metrics.observe(metrics.TRADE_ORDER_SECONDS, exchange):
+                response = place_binance_order(
+                    key.api_key,
+                    key.api_secret,
+                    request.coin,
+                    "BUY" if request.side == 'bid' else "SELL",
+                    trade_qty,
+                    "MARKET"
+                )
             
             logger.info(f"Binance Order Response: {response}")
             
@@ -172,14 +380,7 @@ def execute_trade(request: TradeRequest, db: Session = Depends(get_db), current_
 
         elif exchange == 'korbit':
             # Korbit Logic
-            kor_price_map = {
-                "BTC": latest_price.btc_korbit,
-                "ETH": latest_price.eth_korbit,
-                "XRP": latest_price.xrp_korbit,
-                "SOL": latest_price.sol_korbit,
-                "DOGE": latest_price.doge_korbit,
-            }
-            current_price = kor_price_map.get(request.coin.upper(), 0)
+            current_price = live_price('korbit', request.coin, tick_store.snapshot_price(latest_price, 'korbit', request.coin))
             if current_price <= 0:
                 raise HTTPException(status_code=400, detail="Current Korbit price unavailable")
             
@@ -194,15 +395,16 @@ def execute_trade(request: TradeRequest, db: Session = Depends(get_db), current_
                 raise HTTPException(status_code=400, detail="Order amount too small")
             
             symbol = f"{request.coin.lower()}_krw"
-            response = place_korbit_order(
-                key.api_key,
-                key.api_secret,
-                symbol,
-                "buy" if request.side == 'bid' else "sell",
-                int(current_price),
-                trade_qty,
-                "limit"
-            )
+            with metrics.observe(metrics.TRADE_ORDER_SECONDS, exchange):
+                response = place_korbit_order(
+                    key.api_key,
+                    key.api_secret,
+                    symbol,
+                    "buy" if request.side == 'bid' else "sell",
+                    int(current_price),
+                    trade_qty,
+                    "limit"
+                )
             
             logger.info(f"Korbit Order Response: {response}")
 
@@ -217,16 +419,7 @@ def execute_trade(request: TradeRequest, db: Session = Depends(get_db), current_
             # Bithumb Logic
             trade_units = request.amount
             
-            # Map coin to price field
-            price_map = {
-                "BTC": latest_price.btc_price if latest_price else 0,
-                "ETH": latest_price.eth_price if latest_price else 0,
-                "XRP": latest_price.xrp_price if latest_price else 0,
-                "SOL": latest_price.sol_price if latest_price else 0,
-                "USDT": latest_price.usdt_price if latest_price else 0,
-                "DOGE": latest_price.doge_price if latest_price else 0,
-            }
-            current_price = price_map.get(request.coin.upper(), 0)
+            current_price = live_price('bithumb', request.coin, tick_store.snapshot_price(latest_price, 'bithumb', request.coin))
     
             if request.side == 'ask':
                 if current_price <= 0:
@@ -246,14 +439,15 @@ def execute_trade(request: TradeRequest, db: Session = Depends(get_db), current_
                     )
     
             # For 'bid' (buy), trade_units is KRW amount. For 'ask' (sell), it is Coin volume.
-            response = place_order(
-                key.api_key, 
-                key.api_secret, 
-                request.coin, 
-                "KRW", 
-                trade_units, 
-                request.side
-            )
+            with metrics.observe(metrics.TRADE_ORDER_SECONDS, exchange):
+                response = place_order(
+                    key.api_key, 
+                    key.api_secret, 
+                    request.coin, 
+                    "KRW", 
+                    trade_units, 
+                    request.side
+                )
             
             if "status" in response and response["status"] != "0000":
                  raise Exception(f"Bithumb API Error: {response}")
@@ -277,6 +471,9 @@ def execute_trade(request: TradeRequest, db: Session = Depends(get_db), current_
         )
         db.add(trade_log)
         db.commit()
+        price_stream.broker.publish("trade", price_stream.dumps(
+            {column.name: getattr(trade_log, column.name) for column in TradeLog.__table__.columns}
+        ))
         
         return {"status": "success", "data": response}
 
@@ -358,11 +555,15 @@ def get_key_balance(key_id: int, db: Session = Depends(get_db), current_user: Us
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/prices")
-def get_current_prices(db: Session = Depends(get_db)):
+async def get_current_prices(request: Request, db: AsyncSession = Depends(async_db.get_db)):
     """Get current prices for BTC, USDT and exchange rate"""
-    latest = db.query(PriceLog).order_by(PriceLog.id.desc()).first()
+    tag = http_cache.etag(request)
+    not_modified = http_cache.not_modified(request, tag)
+    if not_modified is not None:
+        return not_modified
+    published = price_snapshot.published() or await db.run_sync(price_snapshot.load)
     
-    if not latest:
+    if not published:
         return {
             "btc_price": 0, "eth_price": 0, "xrp_price": 0, 
             "sol_price": 0, "usdt_price": 0, "doge_price": 0,
@@ -373,47 +574,10 @@ def get_current_prices(db: Session = Depends(get_db)):
             "timestamp": None
         }
     
-    return {
-        # Bithumb Prices (Legacy)
-        "btc_price": latest.btc_price,
-        "eth_price": latest.eth_price,
-        "xrp_price": latest.xrp_price,
-        "sol_price": latest.sol_price,
-        "usdt_price": latest.usdt_price,
-        "doge_price": latest.doge_price,
-        
-        # Binance Prices (Legacy)
-        "binance": {
-            "btc": latest.btc_binance,
-            "eth": latest.eth_binance,
-            "xrp": latest.xrp_binance,
-            "sol": latest.sol_binance,
-            "doge": latest.doge_binance
-        },
-
-        # Korbit Prices (Legacy)
-        "korbit": {
-            "btc": latest.btc_korbit,
-            "eth": latest.eth_korbit,
-            "xrp": latest.xrp_korbit,
-            "sol": latest.sol_korbit,
-            "doge": latest.doge_korbit
-        },
-        
-        "usd_krw_rate": latest.usd_krw_rate,
-        "market_data": latest.market_data or {}, # New JSON data
-        "timestamp": latest.timestamp
-    }
+    # Pre-serialized by the tick writer (see price_snapshot.prices_view for the shape)
+    return Response(content=published.prices_body, media_type="application/json", headers=http_cache.headers(tag))
 
 @app.get("/api/coins")
 def get_available_coins():
     """Get list of available top 30 coins"""
-    coins = get_top_30_coins()
-    if not coins:
-        # Fallback
-        return [
-            {"symbol": "BTC", "name": "Bitcoin"}, {"symbol": "ETH", "name": "Ethereum"},
-            {"symbol": "XRP", "name": "XRP"}, {"symbol": "SOL", "name": "Solana"},
-            {"symbol": "USDT", "name": "Tether"}, {"symbol": "DOGE", "name": "Dogecoin"}
-        ]
-    return coins
+    return coin_universe.get()
@@ -0,0 +1,96 @@
+"""
+Shared latest-state structure for market data.
+
+Each ingestion job (one per exchange) writes its most recent result here on
+its own cadence; the persist stage reads a consistent snapshot of all
+exchanges when it writes a PriceLog row.
+"""
+
+import threading
+from datetime import datetime
+
+EXCHANGES = ("bithumb", "binance", "korbit")
+
+# Keys written into market_data[symbol] for each exchange (legacy alias included)
+EXCHANGE_KEYS = {
+    "bithumb": ("bithumb", "bithumb_krw"),
+    "binance": ("binance", "binance_usdt"),
+    "korbit": ("korbit", "korbit_krw"),
+}
+
+
+class MarketState:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._prices = {name: {} for name in EXCHANGES}
+        self._updated_at = {}
+
+    def update_prices(self, exchange, prices):
+        """Replace the latest prices for one exchange"""
+        with self._lock:
+            self._prices[exchange] = dict(prices)
+            self._updated_at[exchange] = datetime.now()
+
+    def merge_prices(self, exchange, prices):
+        """Update some symbols of one exchange, e.g. from a streaming ticker message"""
+        with self._lock:
+            # Copy-on-write so snapshot() can read a dict without holding the lock
+            self._prices[exchange] = {**self._prices[exchange], **prices}
+            self._updated_at[exchange] = datetime.now()
+
+    def latest_price(self, exchange, symbol, max_age=None):
+        """Latest price for one symbol, or None if unknown or older than max_age seconds"""
+        with self._lock:
+            updated = self._updated_at.get(exchange)
+            price = self._prices.get(exchange, {}).get(symbol)
+        if updated is None or not price:
+            return None
+        if max_age is not None and (datetime.now() - updated).total_seconds() > max_age:
+            return None
+        return price
+
+    def updated_at(self, name):
+        with self._lock:
+            return self._updated_at.get(name)
+
+    def age_seconds(self, name, now=None):
+        """Seconds since the last successful update, or None if never updated"""
+        updated = self.updated_at(name)
+        if updated is None:
+            return None
+        return ((now or datetime.now()) - updated).total_seconds()
+
+    def snapshot(self, symbols, stale_after=None, unlisted=None):
+        """
+        Build market_data for the given symbols.
+        Exchanges whose data is older than stale_after[exchange] seconds are reported as 0.0;
+        symbols in unlisted[exchange] are reported as None (not listed).
+        """
+        stale_after = stale_after or {}
+        unlisted = unlisted or {}
+        now = datetime.now()
+        with self._lock:
+            prices = {}
+            for name in EXCHANGES:
+                updated = self._updated_at.get(name)
+                limit = stale_after.get(name)
+                if updated is None or (limit is not None and (now - updated).total_seconds() > limit):
+                    prices[name] = {}
+                else:
+                    prices[name] = self._prices[name]
+
+        market_data = {}
+        for symbol in symbols:
+            entry = {}
+            for name in EXCHANGES:
+                if symbol in unlisted.get(name, ()):
+                    price = None
+                else:
+                    price = prices[name].get(symbol, 0.0)
+                for key in EXCHANGE_KEYS[name]:
+                    entry[key] = price
+            market_data[symbol] = entry
+        return market_data
+
+
+market_state = MarketState()
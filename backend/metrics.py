@@ -0,0 +1,115 @@
+"""
+Prometheus metrics, exposed at /api/metrics.
+
+Ingestion:  exchange fetch latency/timeouts/errors, persist tick time, tick
+            writer flush latency/batch size/queue depth, spool size and
+            replays, and how stale each exchange's latest prices are.
+Exchanges:  latency and failures of every guarded HTTP call, breaker state.
+API:        per-endpoint request latency, trade order round-trip time and
+            price stream clients.
+"""
+
+import math
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+
+# Ingestion --------------------------------------------------------------
+
+INGESTION_FETCH_SECONDS = Histogram(
+    "ingestion_fetch_seconds", "Duration of one ingestion fetch per exchange", ["exchange"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 12),
+)
+INGESTION_TIMEOUTS = Counter(
+    "ingestion_timeouts_total", "Ingestion fetches cancelled for exceeding their budget", ["exchange"]
+)
+INGESTION_ERRORS = Counter(
+    "ingestion_errors_total", "Ingestion fetches that returned no prices", ["exchange"]
+)
+PERSIST_TICK_SECONDS = Histogram(
+    "persist_tick_seconds", "Duration of one persist tick (snapshot + enqueue)",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+DB_SAVE_SECONDS = Histogram(
+    "db_save_seconds", "Latency of one tick writer flush (one transaction)",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+TICK_WRITER_QUEUE_DEPTH = Gauge(
+    "tick_writer_queue_depth", "Snapshots waiting for the tick writer"
+)
+TICK_WRITER_BATCH_SNAPSHOTS = Histogram(
+    "tick_writer_batch_snapshots", "Snapshots written per flush",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200),
+)
+TICK_WRITER_DROPPED = Counter(
+    "tick_writer_dropped_snapshots_total", "Snapshots dropped because the writer queue was full"
+)
+SPOOL_BYTES = Gauge(
+    "spool_bytes", "Size of the local spool of snapshots waiting for the database"
+)
+SPOOLED_SNAPSHOTS = Counter(
+    "spooled_snapshots_total", "Snapshots written to the local spool after a database failure"
+)
+REPLAYED_SNAPSHOTS = Counter(
+    "replayed_snapshots_total", "Spooled snapshots replayed into the database"
+)
+PRICE_AGE_SECONDS = Gauge(
+    "price_age_seconds", "Seconds since the latest successful update per source (NaN if never)", ["source"]
+)
+
+# Exchange HTTP calls ----------------------------------------------------
+
+EXCHANGE_REQUEST_SECONDS = Histogram(
+    "exchange_request_seconds", "Latency of guarded exchange HTTP calls", ["exchange"],
+    buckets=(0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+EXCHANGE_REQUEST_FAILURES = Counter(
+    "exchange_request_failures_total", "Failed exchange HTTP calls", ["exchange", "reason"]
+)
+EXCHANGE_CIRCUIT_OPEN = Gauge(
+    "exchange_circuit_open", "1 while the exchange's circuit breaker is not closed", ["exchange"]
+)
+
+# API ----------------------------------------------------------------------
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "API request latency per endpoint", ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+TRADE_ORDER_SECONDS = Histogram(
+    "trade_order_seconds", "Round-trip time of order placement per exchange", ["exchange"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+STREAM_SUBSCRIBERS = Gauge(
+    "stream_subscribers", "Clients connected to /api/stream"
+)
+STREAM_DROPPED_CLIENTS = Counter(
+    "stream_dropped_clients_total", "Stream clients disconnected for falling behind"
+)
+
+
+def register_price_age(source, age_fn):
+    """Expose age_fn() (seconds or None) as price_age_seconds{source}"""
+    def value():
+        age = age_fn()
+        return math.nan if age is None else age
+    PRICE_AGE_SECONDS.labels(source).set_function(value)
+
+
+def register_circuit(exchange, guard):
+    EXCHANGE_CIRCUIT_OPEN.labels(exchange).set_function(lambda: 0 if guard.state == "closed" else 1)
+
+
+@contextmanager
+def observe(histogram, *labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        (histogram.labels(*labels) if labels else histogram).observe(time.perf_counter() - start)
+
+
+def render():
+    """(body, content_type) of the Prometheus text exposition"""
+    return generate_latest(), CONTENT_TYPE_LATEST
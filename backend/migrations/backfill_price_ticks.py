@@ -0,0 +1,63 @@
+"""
+Backfill price_ticks from legacy price_logs rows.
+
+Rows written before price_ticks existed keep their prices in the wide
+*_price/*_binance/*_korbit columns and the market_data JSON blob. The API
+serves them as-is, but per-coin range queries and candles only see
+price_ticks. This copies those rows into price_ticks (and rolls them up into
+price_candles) in batches; it is safe to re-run, rows that already have
+ticks are skipped.
+
+Usage (from backend/):
+    python migrations/backfill_price_ticks.py
+"""
+
+import sys
+import os
+
+# Add parent directory to path to import backend modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select, exists
+
+from models import WriteSession, PriceLog, PriceTick
+from schema_migrations import upgrade
+from tick_store import tick_rows, insert_ticks, legacy_market_data
+from rollups import update_candles
+
+BATCH_SIZE = 1000
+
+
+def backfill():
+    upgrade()
+    db = WriteSession()
+    last_id = 0
+    copied = 0
+    try:
+        while True:
+            logs = db.execute(
+                select(PriceLog)
+                .where(PriceLog.id > last_id)
+                .where(~exists().where(PriceTick.timestamp == PriceLog.timestamp))
+                .order_by(PriceLog.id)
+                .limit(BATCH_SIZE)
+            ).scalars().all()
+            if not logs:
+                break
+            rows = []
+            for log in logs:
+                rows.extend(tick_rows(log.timestamp, legacy_market_data(log)))
+            if rows:
+                insert_ticks(db, rows)
+                update_candles(db, rows)
+            db.commit()
+            copied += len(rows)
+            last_id = logs[-1].id
+            print(f"Backfilled up to price_logs.id={last_id} ({copied} ticks)")
+    finally:
+        db.close()
+    print(f"✓ Backfill completed: {copied} ticks")
+
+
+if __name__ == "__main__":
+    backfill()
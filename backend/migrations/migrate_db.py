@@ -1,10 +1,52 @@
+"""
+SQLite -> PostgreSQL Migration
+
+Streams every table of a SQLite database (e.g. a backup of the local
+install) into PostgreSQL with constant memory:
+
+- reads CHUNK_SIZE rows at a time in primary-key order (keyset pagination,
+  never the whole table),
+- writes each chunk with COPY,
+- records the last copied key per table in migration_checkpoints in the
+  same transaction as the chunk, so an interrupted run resumes where it
+  stopped without duplicates.
+
+Columns are matched by name between source and target, so old backups
+without the Binance/Korbit columns or market_data still load, and newer ones
+carry them over. Run migrations/upgrade.py against PostgreSQL first so the
+target schema exists.
+
+Run it with the backend stopped. A running app writes new price_logs,
+price_ticks, price_candles and cached_values rows whose ids and keys would
+clash with the copied history, so the migrator refuses to start while other
+sessions are connected to the target database, or while a table it has not
+started on already has rows.
+
+Usage (from backend/):
+    python migrations/migrate_db.py                         # ./bithumb_trading.db
+    python migrations/migrate_db.py --sqlite /backups/old.db --chunk-size 50000
+    python migrations/migrate_db.py --tables price_logs price_ticks
+"""
+
+import sys
+import os
+import io
+import csv
+import json
+import time
 import sqlite3
+import argparse
+from datetime import datetime, timedelta
+
 import psycopg2
-import os
-from datetime import datetime
+
+# Add parent directory to path to import backend modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retention import PARTITION_PREFIX
 
 # SQLite Backup File Path
-SQLITE_DB_PATH = "bithumb_trading.db" 
+SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", "bithumb_trading.db")
 
 # Postgres Connection Params
 # If running from local machine targeting Docker: localhost:5432
@@ -15,18 +57,206 @@ PG_DB = os.getenv("PG_DB", "bithumb_trading")
 PG_USER = os.getenv("PG_USER", "bithumb")
 PG_PASS = os.getenv("PG_PASS", "bithumb_pass")
 
-def migrate():
-    if not os.path.exists(SQLITE_DB_PATH):
-        print(f"Backup file not found: {SQLITE_DB_PATH}")
-        return
+CHUNK_SIZE = 10000
 
-    print(f"Connecting to SQLite backup ({SQLITE_DB_PATH})...")
-    try:
-        sq_conn = sqlite3.connect(SQLITE_DB_PATH)
-        sq_cursor = sq_conn.cursor()
-    except Exception as e:
-        print(f"Failed to connect to SQLite DB: {e}")
+# (table, primary key columns), parents before children
+TABLES = [
+    ("users", ("id",)),
+    ("api_keys", ("id",)),
+    ("trade_logs", ("id",)),
+    ("price_logs", ("id",)),
+    ("price_ticks", ("symbol", "exchange", "timestamp")),
+    ("price_candles", ("resolution", "symbol", "exchange", "bucket_start")),
+    ("cached_values", ("key",)),
+]
+
+# Old SQLite column names -> current ones
+RENAMED_COLUMNS = {
+    "api_keys": {"access_key": "api_key", "secret_key": "api_secret"},
+}
+
+NULL = r"\N"
+
+
+def _sqlite_columns(sq_conn, table):
+    return [row[1] for row in sq_conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _pg_columns(pg_cursor, table):
+    pg_cursor.execute(
+        "SELECT column_name FROM information_schema.columns WHERE table_schema = 'public' AND table_name = %s",
+        (table,),
+    )
+    return {row[0] for row in pg_cursor.fetchall()}
+
+
+def _ensure_checkpoints(pg_conn):
+    with pg_conn.cursor() as cur:
+        cur.execute(
+            "CREATE TABLE IF NOT EXISTS migration_checkpoints ("
+            "table_name VARCHAR PRIMARY KEY, last_key TEXT NOT NULL, rows BIGINT NOT NULL, updated_at TIMESTAMP NOT NULL)"
+        )
+    pg_conn.commit()
+
+
+def _checkpoint(pg_cursor, table):
+    """(last copied key or None, rows copied so far)"""
+    pg_cursor.execute("SELECT last_key, rows FROM migration_checkpoints WHERE table_name = %s", (table,))
+    row = pg_cursor.fetchone()
+    return (tuple(json.loads(row[0])), row[1]) if row else (None, 0)
+
+
+def _save_checkpoint(pg_cursor, table, last_key, rows):
+    pg_cursor.execute(
+        "INSERT INTO migration_checkpoints (table_name, last_key, rows, updated_at) VALUES (%s, %s, %s, %s) "
+        "ON CONFLICT (table_name) DO UPDATE SET last_key = EXCLUDED.last_key, rows = EXCLUDED.rows, "
+        "updated_at = EXCLUDED.updated_at",
+        (table, json.dumps(list(last_key)), rows, datetime.now()),
+    )
+
+
+def _preflight(sq_conn, pg_conn, tables, allow_connections=False):
+    """Reasons not to start (the app is connected, a target table already has foreign rows); empty if clear"""
+    problems = []
+    with pg_conn.cursor() as cur:
+        if not allow_connections:
+            cur.execute(
+                "SELECT count(*) FROM pg_stat_activity WHERE datname = current_database() "
+                "AND pid <> pg_backend_pid() AND backend_type = 'client backend'"
+            )
+            connections = cur.fetchone()[0]
+            if connections:
+                problems.append(
+                    f"{connections} other session(s) are connected to {PG_DB}; stop the backend first "
+                    "(docker-compose stop backend) or pass --allow-connections if they are not writing"
+                )
+        for table, _ in tables:
+            if not _sqlite_columns(sq_conn, table) or not _pg_columns(cur, table):
+                continue
+            last_key, _ = _checkpoint(cur, table)
+            if last_key is not None:
+                continue
+            cur.execute(f"SELECT EXISTS (SELECT 1 FROM {table})")
+            if cur.fetchone()[0]:
+                problems.append(
+                    f"{table} already has rows that were not copied by this tool (the app ran against "
+                    "this database); migrate into a freshly upgraded database before starting the backend"
+                )
+    return problems
+
+
+def _ensure_tick_partitions(pg_conn, sq_conn):
+    """Daily price_ticks partitions covering the source range, plus the default one"""
+    with pg_conn.cursor() as cur:
+        cur.execute("SELECT relkind FROM pg_class WHERE relname = 'price_ticks'")
+        row = cur.fetchone()
+    if not row or row[0] != "p":
         return
+    first, last = sq_conn.execute("SELECT min(timestamp), max(timestamp) FROM price_ticks").fetchone()
+    if first is not None:
+        day = datetime.fromisoformat(first).replace(hour=0, minute=0, second=0, microsecond=0)
+        last_day = datetime.fromisoformat(last)
+        while day <= last_day:
+            with pg_conn.cursor() as cur:
+                try:
+                    cur.execute(
+                        f"CREATE TABLE IF NOT EXISTS {PARTITION_PREFIX}{day:%Y%m%d} PARTITION OF price_ticks "
+                        f"FOR VALUES FROM ('{day:%Y-%m-%d}') TO ('{day + timedelta(days=1):%Y-%m-%d}')"
+                    )
+                    pg_conn.commit()
+                except psycopg2.Error as e:
+                    # e.g. the default partition already holds rows of that day
+                    pg_conn.rollback()
+                    print(f"⚠ Could not create partition for {day:%Y-%m-%d}: {e}")
+            day += timedelta(days=1)
+    with pg_conn.cursor() as cur:
+        cur.execute("CREATE TABLE IF NOT EXISTS price_ticks_default PARTITION OF price_ticks DEFAULT")
+    pg_conn.commit()
+
+
+def _copy_chunk(pg_cursor, table, columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([NULL if value is None else value for value in row])
+    buffer.seek(0)
+    pg_cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '{NULL}')", buffer
+    )
+
+
+def migrate_table(sq_conn, pg_conn, table, key, chunk_size=CHUNK_SIZE):
+    source_columns = _sqlite_columns(sq_conn, table)
+    if not source_columns:
+        print(f"- {table}: not in the SQLite database, skipping")
+        return 0
+
+    with pg_conn.cursor() as cur:
+        target_columns = _pg_columns(cur, table)
+        if not target_columns:
+            print(f"⚠ {table}: missing in PostgreSQL, run migrations/upgrade.py first; skipping")
+            return 0
+        last_key, copied = _checkpoint(cur, table)
+        if last_key is None:
+            cur.execute(f"SELECT EXISTS (SELECT 1 FROM {table})")
+            if cur.fetchone()[0]:
+                # _preflight refuses this case; never copy on top of rows of unknown origin
+                raise RuntimeError(f"{table}: target already has rows and no checkpoint")
+
+    renamed = RENAMED_COLUMNS.get(table, {})
+    # (source column, target column) pairs present on both sides
+    pairs = [(col, renamed.get(col, col)) for col in source_columns if renamed.get(col, col) in target_columns]
+    source_names = [source for source, _ in pairs]
+    key_positions = [source_names.index(col) for col in key]
+    dropped = sorted(set(source_columns) - set(source_names))
+    if dropped:
+        print(f"- {table}: columns not in PostgreSQL, not copied: {', '.join(dropped)}")
+
+    key_list = ", ".join(key)
+    select_sql = f"SELECT {', '.join(source_names)} FROM {table}"
+    order_sql = f" ORDER BY {key_list} LIMIT ?"
+    after_sql = f" WHERE ({key_list}) > ({', '.join('?' * len(key))})"
+
+    if last_key is not None:
+        print(f"- {table}: resuming after {copied} rows")
+    start_time = time.time()
+    started_at = copied
+    while True:
+        if last_key is None:
+            rows = sq_conn.execute(select_sql + order_sql, (chunk_size,)).fetchall()
+        else:
+            rows = sq_conn.execute(select_sql + after_sql + order_sql, (*last_key, chunk_size)).fetchall()
+        if not rows:
+            break
+        last_key = tuple(rows[-1][i] for i in key_positions)
+        copied += len(rows)
+        with pg_conn.cursor() as cur:
+            _copy_chunk(cur, table, [target for _, target in pairs], rows)
+            _save_checkpoint(cur, table, last_key, copied)
+        pg_conn.commit()
+        elapsed = max(time.time() - start_time, 1e-6)
+        print(f"  {table}: {copied} rows ({(copied - started_at) / elapsed:.0f} rows/s)")
+
+    with pg_conn.cursor() as cur:
+        if key == ("id",):
+            # Rows keep their ids; move the sequence past them
+            cur.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) "
+                f"FROM {table}"
+            )
+    pg_conn.commit()
+    print(f"✓ {table}: {copied} rows")
+    return copied
+
+
+def migrate(sqlite_path=SQLITE_DB_PATH, tables=None, chunk_size=CHUNK_SIZE, allow_connections=False):
+    """Returns True once every selected table is copied"""
+    if not os.path.exists(sqlite_path):
+        print(f"Backup file not found: {sqlite_path}")
+        return False
+
+    print(f"Connecting to SQLite backup ({sqlite_path})...")
+    sq_conn = sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True)
 
     print(f"Connecting to PostgreSQL ({PG_HOST}:{PG_PORT})...")
     try:
@@ -37,89 +267,50 @@ def migrate():
             user=PG_USER,
             password=PG_PASS
         )
-        pg_cursor = pg_conn.cursor()
     except Exception as e:
         print(f"Failed to connect to Postgres: {e}")
-        print("Make sure Docker containers are running and port 5432 is exposed.")
-        return
+        print("Make sure the database container is running and port 5432 is exposed.")
+        sq_conn.close()
+        return False
 
+    selected = [(table, key) for table, key in TABLES if not tables or table in tables]
     try:
-        # 1. API Keys
-        print("Migrating API Keys...")
-        try:
-            sq_cursor.execute("SELECT name, access_key, secret_key FROM api_keys")
-            keys = sq_cursor.fetchall()
-            for k in keys:
-                # Check existence
-                pg_cursor.execute("SELECT id FROM api_keys WHERE name = %s", (k[0],))
-                if not pg_cursor.fetchone():
-                    pg_cursor.execute(
-                        "INSERT INTO api_keys (exchange, name, access_key, secret_key) VALUES (%s, %s, %s, %s)",
-                        ('bithumb', k[0], k[1], k[2])
-                    )
-        except sqlite3.OperationalError:
-            print("No api_keys table found in backup, skipping.")
-
-        # 2. Trade Logs
-        print("Migrating Trade Logs...")
-        try:
-            sq_cursor.execute("SELECT timestamp, side, amount_krw, amount_btc, price, order_id FROM trade_logs")
-            trades = sq_cursor.fetchall()
-            for t in trades:
-                pg_cursor.execute(
-                    """
-                    INSERT INTO trade_logs 
-                    (timestamp, exchange, side, amount_krw, amount_btc, price, order_id) 
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    """,
-                    (t[0], 'bithumb', t[1], t[2], t[3], t[4], t[5])
-                )
-        except sqlite3.OperationalError:
-             print("No trade_logs table found in backup, skipping.")
-
-        # 3. Price Logs
-        print("Migrating Price Logs...")
-        try:
-            sq_cursor.execute("SELECT timestamp, btc_price, eth_price, xrp_price, sol_price, usdt_price, doge_price, usd_krw_rate FROM price_logs")
-            prices = sq_cursor.fetchall()
-            
-            batch_size = 1000
-            batch = []
-            total = 0
-            for p in prices:
-                # New columns: btc_binance... set to 0
-                batch.append((
-                    p[0], p[1], p[2], p[3], p[4], p[5], p[6], 
-                    0, 0, 0, 0, 0, # Binance columns
-                    p[7]
-                ))
-                
-                if len(batch) >= batch_size:
-                    args_str = ','.join(pg_cursor.mogrify("(%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)", x).decode('utf-8') for x in batch)
-                    pg_cursor.execute("INSERT INTO price_logs (timestamp, btc_price, eth_price, xrp_price, sol_price, usdt_price, doge_price, btc_binance, eth_binance, xrp_binance, sol_binance, doge_binance, usd_krw_rate) VALUES " + args_str)
-                    total += len(batch)
-                    batch = []
-                    print(f"Inserted {total} price logs...")
-
-            if batch:
-                args_str = ','.join(pg_cursor.mogrify("(%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)", x).decode('utf-8') for x in batch)
-                pg_cursor.execute("INSERT INTO price_logs (timestamp, btc_price, eth_price, xrp_price, sol_price, usdt_price, doge_price, btc_binance, eth_binance, xrp_binance, sol_binance, doge_binance, usd_krw_rate) VALUES " + args_str)
-                total += len(batch)
-                print(f"Inserted {total} price logs total.")
-
-        except sqlite3.OperationalError:
-             print("No price_logs table found in backup, skipping.")
-
-        pg_conn.commit()
+        _ensure_checkpoints(pg_conn)
+        problems = _preflight(sq_conn, pg_conn, selected, allow_connections)
+        pg_conn.rollback()
+        if problems:
+            for problem in problems:
+                print(f"✗ {problem}")
+            print("Nothing was copied.")
+            return False
+        for table, key in selected:
+            if table == "price_ticks" and _sqlite_columns(sq_conn, table):
+                _ensure_tick_partitions(pg_conn, sq_conn)
+            migrate_table(sq_conn, pg_conn, table, key, chunk_size)
         print("Migration completed successfully!")
-        
+        return True
     except Exception as e:
-        print(f"Migration failed: {e}")
+        # Committed chunks stay; re-running resumes from the checkpoints
         pg_conn.rollback()
+        print(f"Migration failed: {e}")
+        print("Re-run the script to resume from the last committed chunk.")
+        return False
     finally:
         sq_conn.close()
         pg_conn.close()
 
-if __name__ == "__main__":
-    migrate()
 
+def main():
+    parser = argparse.ArgumentParser(description="Stream a SQLite database into PostgreSQL (resumable)")
+    parser.add_argument("--sqlite", default=SQLITE_DB_PATH, help=f"SQLite file (default: {SQLITE_DB_PATH})")
+    parser.add_argument("--tables", nargs="+", choices=[table for table, _ in TABLES], help="Only these tables")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help=f"Rows per COPY (default: {CHUNK_SIZE})")
+    parser.add_argument("--allow-connections", action="store_true",
+                        help="Run even if other sessions are connected to the target database")
+    args = parser.parse_args()
+    if not migrate(args.sqlite, args.tables, args.chunk_size, args.allow_connections):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Schema Upgrade
+
+Applies pending schema migrations (see schema_migrations.py). Run it before
+starting the API; the API itself only checks the recorded version.
+
+Usage (from backend/):
+    python migrations/upgrade.py          # apply pending migrations
+    python migrations/upgrade.py --check  # print the version, exit 1 if behind
+"""
+
+import sys
+import os
+import argparse
+import logging
+
+# Add parent directory to path to import backend modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import schema_migrations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply pending database schema migrations")
+    parser.add_argument("--check", action="store_true", help="Only report the current version")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.check:
+        try:
+            version = schema_migrations.check()
+        except RuntimeError as e:
+            print(f"⚠ {e}")
+            sys.exit(1)
+        print(f"✓ Database schema is at version {version} (latest {schema_migrations.HEAD})")
+        return
+
+    version = schema_migrations.upgrade()
+    print(f"✓ Database schema is at version {version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 import os
-from sqlalchemy import Column, Integer, String, Float, DateTime, create_engine, JSON, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, create_engine, event, JSON, Boolean, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
@@ -7,6 +7,12 @@ from datetime import datetime
 Base = declarative_base()
 
 class PriceLog(Base):
+    """
+    One row per persisted market snapshot. The prices of new snapshots live in
+    price_ticks (joined on timestamp); the wide columns and market_data below
+    are only filled for rows written before price_ticks existed.
+    Read through tick_store, which serves both kinds in the legacy shape.
+    """
     __tablename__ = "price_logs"
     
     id = Column(Integer, primary_key=True, index=True)
@@ -40,6 +46,51 @@ class PriceLog(Base):
     # Dynamic Market Data (JSON)
     market_data = Column(JSON, default={})
 
+    # Symbols tracked and those unlisted per exchange when the row was written:
+    # {"symbols": [...], "unlisted": {exchange: [...]}} (see tick_store.snapshot_layout)
+    layout = Column(JSON, nullable=True)
+
+class PriceTick(Base):
+    """One price of one symbol on one exchange at one snapshot timestamp"""
+    __tablename__ = "price_ticks"
+
+    # (symbol, exchange, timestamp) is the primary key, so a one-coin,
+    # one-exchange range query is a single index range scan
+    symbol = Column(String, primary_key=True)
+    exchange = Column(String, primary_key=True)
+    timestamp = Column(DateTime, primary_key=True)
+    price = Column(Float, nullable=False)
+
+    __table_args__ = (
+        # Whole-snapshot lookups (all prices at one timestamp)
+        Index("ix_price_ticks_timestamp", "timestamp"),
+        {
+            # Store rows in primary-key order on SQLite (clustered, no separate rowid b-tree)
+            "sqlite_with_rowid": False,
+            # Daily partitions on PostgreSQL, created and dropped by retention.py
+            "postgresql_partition_by": "RANGE (timestamp)",
+        },
+    )
+
+class PriceCandle(Base):
+    """OHLC candle of one symbol on one exchange, maintained incrementally at ingest (see rollups.py)"""
+    __tablename__ = "price_candles"
+
+    resolution = Column(String, primary_key=True)  # '1m', '5m', '1h', '1d'
+    symbol = Column(String, primary_key=True)
+    exchange = Column(String, primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    count = Column(Integer, nullable=False, default=1)  # Number of ticks in the bucket
+    # Timestamps of the ticks that set open/close, so late ticks cannot overwrite them
+    first_at = Column(DateTime, nullable=False)
+    last_at = Column(DateTime, nullable=False)
+
+    __table_args__ = ({"sqlite_with_rowid": False},)
+
 class TradeLog(Base):
     __tablename__ = "trade_logs"
     
@@ -76,151 +127,77 @@ class APIKey(Base):
     
     owner = relationship("User", back_populates="api_keys")
 
+class CachedValue(Base):
+    """Last good value of a slow external lookup (e.g. the top coins list), kept across restarts"""
+    __tablename__ = "cached_values"
+
+    key = Column(String, primary_key=True)
+    value = Column(JSON)
+    updated_at = Column(DateTime, default=datetime.now)
+
+class SchemaMigration(Base):
+    """One applied schema migration (see schema_migrations.py)"""
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    applied_at = Column(DateTime, default=datetime.now)
+
 # Database Setup
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./bithumb_trading.db")
 
+# SQLite profile for single-node installs; SQLITE_TUNED=false keeps the driver defaults
+SQLITE_TUNED = os.getenv("SQLITE_TUNED", "true").lower() not in ("0", "false", "no")
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",        # Readers and the writer no longer block each other
+    "synchronous": "NORMAL",      # fsync at WAL checkpoints only; a power cut may lose the last commits, never corrupts
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536")),  # Negative = KiB instead of pages
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,         # ms to wait for the write lock instead of failing with "database is locked"
+}
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None):
+    """Connect hook applying SQLITE_PRAGMAS (also used by the async engine)"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
 if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
     engine = create_engine(
         SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
     )
+
+    # All background writes (tick writer, retention, cached values) share one
+    # connection, so in-process writers queue on the pool instead of on
+    # SQLite's lock, and take the write lock up front (BEGIN IMMEDIATE) so a
+    # transaction that read first cannot fail to upgrade to a writer.
+    write_engine = create_engine(
+        SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}, pool_size=1, max_overflow=0
+    )
+
+    @event.listens_for(write_engine, "connect")
+    def _writer_connect(dbapi_connection, connection_record):
+        # Let SQLAlchemy emit BEGIN itself (see _writer_begin)
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(write_engine, "begin")
+    def _writer_begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    if SQLITE_TUNED:
+        event.listen(engine, "connect", apply_sqlite_pragmas)
+        event.listen(write_engine, "connect", apply_sqlite_pragmas)
 else:
     engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    write_engine = engine
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def init_db():
-    """
-    Initialize database: create tables and automatically migrate schema changes.
-    This function runs on application startup and ensures all required tables and columns exist.
-    """
-    # Create all tables defined in models
-    Base.metadata.create_all(bind=engine)
-    
-    # Auto-migrate: Add missing columns and handle schema changes for existing tables
-    # This is a simple migration approach. For production, consider using Alembic.
-    from sqlalchemy import inspect, text
-    
-    inspector = inspect(engine)
-    
-    # Migrate price_logs table
-    if 'price_logs' in inspector.get_table_names():
-        existing_columns = [col['name'] for col in inspector.get_columns('price_logs')]
-        
-        # Define required columns with their types
-        required_columns = {
-            'btc_korbit': 'DOUBLE PRECISION DEFAULT 0.0',
-            'eth_korbit': 'DOUBLE PRECISION DEFAULT 0.0',
-            'xrp_korbit': 'DOUBLE PRECISION DEFAULT 0.0',
-            'sol_korbit': 'DOUBLE PRECISION DEFAULT 0.0',
-            'doge_korbit': 'DOUBLE PRECISION DEFAULT 0.0',
-            'btc_binance': 'DOUBLE PRECISION DEFAULT 0.0',
-            'eth_binance': 'DOUBLE PRECISION DEFAULT 0.0',
-            'xrp_binance': 'DOUBLE PRECISION DEFAULT 0.0',
-            'sol_binance': 'DOUBLE PRECISION DEFAULT 0.0',
-            'doge_binance': 'DOUBLE PRECISION DEFAULT 0.0',
-            'market_data': "JSONB DEFAULT '{}'::jsonb" if not SQLALCHEMY_DATABASE_URL.startswith("sqlite") else "JSON DEFAULT '{}'"
-        }
-        
-        with engine.connect() as conn:
-            for col_name, col_def in required_columns.items():
-                if col_name not in existing_columns:
-                    try:
-                        if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
-                            conn.execute(text(f"ALTER TABLE price_logs ADD COLUMN {col_name} {col_def}"))
-                        else:
-                            conn.execute(text(f"ALTER TABLE price_logs ADD COLUMN {col_name} {col_def}"))
-                        conn.commit()
-                        print(f"✓ Added missing column: price_logs.{col_name}")
-                    except Exception as e:
-                        print(f"⚠ Warning: Could not add column {col_name}: {e}")
-                        conn.rollback()
-    
-    # Migrate users table
-    if 'users' in inspector.get_table_names():
-        existing_columns = [col['name'] for col in inspector.get_columns('users')]
-        
-        with engine.connect() as conn:
-            # Add phone_number column if it doesn't exist
-            if 'phone_number' not in existing_columns:
-                try:
-                    if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
-                        conn.execute(text("ALTER TABLE users ADD COLUMN phone_number VARCHAR"))
-                    else:
-                        conn.execute(text("ALTER TABLE users ADD COLUMN phone_number VARCHAR"))
-                    conn.commit()
-                    print("✓ Added missing column: users.phone_number")
-                except Exception as e:
-                    print(f"⚠ Warning: Could not add column users.phone_number: {e}")
-                    conn.rollback()
-    
-    # Migrate api_keys table
-    if 'api_keys' in inspector.get_table_names():
-        existing_columns = [col['name'] for col in inspector.get_columns('api_keys')]
-        
-        with engine.connect() as conn:
-            # Add user_id column if it doesn't exist
-            if 'user_id' not in existing_columns:
-                try:
-                    if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
-                        conn.execute(text("ALTER TABLE api_keys ADD COLUMN user_id INTEGER"))
-                    else:
-                        conn.execute(text("ALTER TABLE api_keys ADD COLUMN user_id INTEGER REFERENCES users(id)"))
-                    conn.commit()
-                    print("✓ Added missing column: api_keys.user_id")
-                    
-                    # Try to set default user_id for existing records (if users table exists)
-                    if 'users' in inspector.get_table_names():
-                        try:
-                            user_result = conn.execute(text("SELECT id FROM users ORDER BY id LIMIT 1")).first()
-                            if user_result:
-                                user_id = user_result[0]
-                                conn.execute(text(f"UPDATE api_keys SET user_id = {user_id} WHERE user_id IS NULL"))
-                                conn.commit()
-                                print(f"✓ Set default user_id={user_id} for existing API keys")
-                        except Exception as e:
-                            print(f"⚠ Warning: Could not set default user_id: {e}")
-                except Exception as e:
-                    print(f"⚠ Warning: Could not add column api_keys.user_id: {e}")
-                    conn.rollback()
-            
-            # Rename access_key to api_key if needed
-            if 'access_key' in existing_columns and 'api_key' not in existing_columns:
-                try:
-                    if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
-                        # SQLite doesn't support RENAME COLUMN directly, need to recreate table
-                        print("⚠ SQLite doesn't support column rename. Please manually migrate access_key to api_key.")
-                    else:
-                        conn.execute(text("ALTER TABLE api_keys RENAME COLUMN access_key TO api_key"))
-                        conn.commit()
-                        print("✓ Renamed column: api_keys.access_key → api_key")
-                except Exception as e:
-                    print(f"⚠ Warning: Could not rename access_key to api_key: {e}")
-                    conn.rollback()
-            
-            # Rename secret_key to api_secret if needed
-            if 'secret_key' in existing_columns and 'api_secret' not in existing_columns:
-                try:
-                    if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
-                        print("⚠ SQLite doesn't support column rename. Please manually migrate secret_key to api_secret.")
-                    else:
-                        conn.execute(text("ALTER TABLE api_keys RENAME COLUMN secret_key TO api_secret"))
-                        conn.commit()
-                        print("✓ Renamed column: api_keys.secret_key → api_secret")
-                except Exception as e:
-                    print(f"⚠ Warning: Could not rename secret_key to api_secret: {e}")
-                    conn.rollback()
-            
-            # Add created_at column if it doesn't exist
-            if 'created_at' not in existing_columns:
-                try:
-                    if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
-                        conn.execute(text("ALTER TABLE api_keys ADD COLUMN created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP"))
-                    else:
-                        conn.execute(text("ALTER TABLE api_keys ADD COLUMN created_at TIMESTAMP DEFAULT NOW()"))
-                    conn.commit()
-                    print("✓ Added missing column: api_keys.created_at")
-                except Exception as e:
-                    print(f"⚠ Warning: Could not add column api_keys.created_at: {e}")
-                    conn.rollback()
-    
-    print("✓ Database initialization and migration completed.")
+# Sessions for background writers; on SQLite this is the single serialized writer
+WriteSession = sessionmaker(autocommit=False, autoflush=False, bind=write_engine)
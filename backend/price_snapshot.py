@@ -0,0 +1,148 @@
+"""
+In-memory latest price snapshot.
+
+The persist stage publishes every snapshot here as soon as it is taken from
+market_state, before (and independently of) the database write, already
+rendered in the legacy shape and pre-serialized as the /api/prices and
+/api/market/current response bodies. Those endpoints and execute_trade read
+it without touching the database, so they stay fresh during a database
+outage. Until a snapshot is stored its id is None; the tick writer
+republishes it with its PriceLog id after the commit. Only while it is cold
+(right after startup, before the first snapshot) do readers fall back to the
+latest row in the database, which then warms it.
+
+A published snapshot is never modified: publish() builds a new, deeply
+read-only one and swaps a single reference, so readers need no lock.
+
+It also tracks the id of the newest PriceLog row written (latest_id) and a
+counter bumped on every change; together they key the HTTP cache validators
+of the market data endpoints (http_cache).
+"""
+
+import json
+import threading
+import logging
+from types import MappingProxyType
+from typing import NamedTuple
+
+import tick_store
+
+logger = logging.getLogger(__name__)
+
+
+class Published(NamedTuple):
+    snapshot: MappingProxyType  # Legacy-shaped latest snapshot (read-only at every level)
+    prices_body: bytes          # /api/prices response
+    current_body: bytes         # /api/market/current response
+
+
+def _dumps(value):
+    # Same output as FastAPI's encoder for these types (datetime -> ISO 8601)
+    return json.dumps(value, default=lambda o: o.isoformat(), separators=(",", ":")).encode()
+
+
+def _freeze(value):
+    """Read-only copy: dicts become MappingProxyType and lists tuples, recursively"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def prices_view(latest):
+    """/api/prices shape of a legacy-shaped snapshot"""
+    return {
+        # Bithumb Prices (Legacy)
+        "btc_price": latest["btc_price"],
+        "eth_price": latest["eth_price"],
+        "xrp_price": latest["xrp_price"],
+        "sol_price": latest["sol_price"],
+        "usdt_price": latest["usdt_price"],
+        "doge_price": latest["doge_price"],
+
+        # Binance Prices (Legacy)
+        "binance": {
+            "btc": latest["btc_binance"],
+            "eth": latest["eth_binance"],
+            "xrp": latest["xrp_binance"],
+            "sol": latest["sol_binance"],
+            "doge": latest["doge_binance"]
+        },
+
+        # Korbit Prices (Legacy)
+        "korbit": {
+            "btc": latest["btc_korbit"],
+            "eth": latest["eth_korbit"],
+            "xrp": latest["xrp_korbit"],
+            "sol": latest["sol_korbit"],
+            "doge": latest["doge_korbit"]
+        },
+
+        "usd_krw_rate": latest["usd_krw_rate"],
+        "market_data": latest["market_data"],
+        "timestamp": latest["timestamp"]
+    }
+
+
+class PriceSnapshot:
+    def __init__(self):
+        self._published = None
+        self._version = (None, 0)  # (latest_id, changes), swapped as one reference
+        self._lock = threading.Lock()  # Serializes publishers only
+
+    def publish(self, snapshot):
+        """
+        Make a legacy-shaped snapshot (id None if not stored yet) the latest
+        one; returns its Published, or None if it is older than the current one.
+        A snapshot with the same timestamp replaces the current one (its stored
+        version, with the id).
+        """
+        published = Published(_freeze(snapshot), _dumps(prices_view(snapshot)), _dumps(snapshot))
+        with self._lock:
+            current = self._published
+            if current is not None and current.snapshot["timestamp"] > snapshot["timestamp"]:
+                # e.g. a spool replay of older snapshots
+                return None
+            self._published = published
+            # After the swap, so a version never runs ahead of the snapshot readers see
+            self._bump(snapshot["id"])
+        return published
+
+    def _bump(self, log_id):
+        latest_id, changes = self._version
+        if log_id is not None and (latest_id is None or log_id > latest_id):
+            latest_id = log_id
+        self._version = (latest_id, changes + 1)
+
+    def advance(self, log_id):
+        """Record that rows up to log_id are committed; call after the commit"""
+        with self._lock:
+            self._bump(log_id)
+
+    def latest_id(self):
+        """Id of the newest committed PriceLog row seen by this process, or None"""
+        return self._version[0]
+
+    def version(self):
+        """(latest_id, changes): differs whenever anything readers can see has changed; None while cold"""
+        version = self._version
+        return None if version[1] == 0 else version
+
+    def published(self):
+        """Latest Published, or None while cold"""
+        return self._published
+
+    def load(self, db):
+        """Database fallback: warm from the latest stored snapshot; None if there is none"""
+        latest = tick_store.latest_snapshot(db)
+        if latest:
+            self.publish(latest)
+        return self._published
+
+    def get(self, db):
+        """Latest Published, from memory or (cold) the database"""
+        return self._published or self.load(db)
+
+
+price_snapshot = PriceSnapshot()
@@ -0,0 +1,114 @@
+"""
+Server-Sent Events push of new ticks and trades (/api/stream).
+
+Publishers (the persist stage for every live snapshot, the tick writer
+thread after each flush, execute_trade after a trade is recorded) hand the
+broker an already serialized payload; the broker frames it once as an SSE
+message and fans the same bytes out to every subscriber's queue on the API
+event loop. Each subscriber gets each event exactly once, in order, from the
+moment it subscribed.
+
+Backpressure: a subscriber's queue holds SUBSCRIBER_QUEUE_SIZE messages. A
+client that falls that far behind is disconnected instead of buffering
+without bound or slowing everyone else down; EventSource reconnects on its
+own and the client re-fetches the current state on (re)connect.
+"""
+
+import json
+import asyncio
+import logging
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 64      # Messages buffered per client before it is dropped as too slow
+HEARTBEAT_SECONDS = 15          # Comment line sent when idle, keeps proxies from closing the stream
+RETRY_MILLISECONDS = 3000       # EventSource reconnect delay
+
+_CLOSED = object()
+
+
+def frame(event, data, event_id=None):
+    """One SSE message; data is a serialized JSON payload (bytes or str)"""
+    if isinstance(data, bytes):
+        data = data.decode()
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {data}\n\n".encode()
+
+
+def dumps(value):
+    return json.dumps(value, default=lambda o: o.isoformat(), separators=(",", ":")).encode()
+
+
+class Subscriber:
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = False
+
+
+class StreamBroker:
+    def __init__(self):
+        self._loop = None
+        self._subscribers = set()
+
+    def publish(self, event, data, event_id=None):
+        """Push one event to all subscribers; callable from any thread, never blocks"""
+        loop = self._loop
+        if loop is None or not self._subscribers:
+            return
+        message = frame(event, data, event_id)
+        try:
+            loop.call_soon_threadsafe(self._fan_out, message)
+        except RuntimeError:
+            # Event loop already closed (shutdown)
+            pass
+
+    def _fan_out(self, message):
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+
+    def _drop(self, subscriber):
+        self._subscribers.discard(subscriber)
+        subscriber.dropped = True
+        metrics.STREAM_DROPPED_CLIENTS.inc()
+        logger.warning("Dropped a stream client that fell behind")
+        # Wake the client's generator so it ends the response
+        subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(_CLOSED)
+
+    def subscribe(self):
+        """Register a client; call on the event loop, before reading the state sent as its initial messages"""
+        self._loop = asyncio.get_running_loop()
+        subscriber = Subscriber()
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    async def events(self, subscriber, initial=()):
+        """SSE byte stream for a subscribed client: initial messages, then every event published since subscribe()"""
+        try:
+            yield f"retry: {RETRY_MILLISECONDS}\n\n".encode()
+            for message in initial:
+                yield message
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if message is _CLOSED:
+                    return
+                yield message
+        finally:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+
+broker = StreamBroker()
+# Only the process-wide broker backs the gauge; other instances (tests) stay out of it
+metrics.STREAM_SUBSCRIBERS.set_function(broker.subscriber_count)
@@ -0,0 +1,226 @@
+"""
+Per-exchange resilience: adaptive timeouts, hedged requests and circuit breakers.
+
+Every exchange call made through exchange_client goes through the exchange's
+ExchangeGuard, which:
+  - tracks recent latencies and derives the timeout from p99 (bounded by
+    min/max), instead of hard-coded per-call timeouts;
+  - fires a duplicate (hedged) request when an idempotent call has not
+    answered by p95, and takes whichever answers first;
+  - opens a circuit breaker after repeated failures so calls fail fast until
+    a single half-open probe succeeds.
+
+Non-adaptive calls (order placement, or calls with an explicit timeout) are
+never hedged and keep their static timeout, so a slow exchange cannot cause
+a duplicate or an abandoned order. They still count towards the breaker.
+"""
+
+import asyncio
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+LATENCY_WINDOW = 200          # Number of recent latencies kept per exchange
+MIN_SAMPLES = 20              # Below this, use the configured initial timeout and do not hedge
+TIMEOUT_P99_MULTIPLIER = 2.0  # Adaptive timeout = p99 * multiplier, clamped to [min, max]
+
+FAILURE_THRESHOLD = 5         # Consecutive failures that open the breaker
+OPEN_SECONDS = 30             # How long the breaker stays open before a half-open probe
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# Threads for hedged sync calls; the losing request finishes in the background
+_hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _is_failure_response(response):
+    # Rate limiting and server errors indicate a degraded exchange; other 4xx are API errors
+    status = getattr(response, "status_code", 200)
+    return status == 429 or status >= 500
+
+
+class ExchangeGuard:
+    def __init__(self, name, initial_timeout, min_timeout, max_timeout):
+        self.name = name
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+        self.hedged_requests = 0
+        self.failures = 0
+        self.rejected = 0
+
+    # -- latency ---------------------------------------------------------
+
+    def percentiles(self):
+        with self._lock:
+            values = sorted(self._latencies)
+        return {p: _percentile(values, p) for p in (50, 95, 99)} if len(values) >= MIN_SAMPLES else {}
+
+    def timeout(self):
+        p99 = self.percentiles().get(99)
+        if p99 is None:
+            return self.initial_timeout
+        return max(self.min_timeout, min(self.max_timeout, p99 * TIMEOUT_P99_MULTIPLIER))
+
+    def hedge_delay(self):
+        return self.percentiles().get(95)
+
+    # -- circuit breaker -------------------------------------------------
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= OPEN_SECONDS:
+                return HALF_OPEN
+            return self._state
+
+    def _before_call(self):
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < OPEN_SECONDS:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"{self.name} circuit open")
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN:
+                if self._probe_in_flight:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"{self.name} circuit half-open, probe in flight")
+                self._probe_in_flight = True
+
+    def _record_success(self, latency):
+        with self._lock:
+            if latency is not None:
+                self._latencies.append(latency)
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+            if self._state != CLOSED:
+                logger.info(f"{self.name} circuit closed")
+            self._state = CLOSED
+
+    def _record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._consecutive_failures += 1
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN or self._consecutive_failures >= FAILURE_THRESHOLD:
+                if self._state != OPEN:
+                    logger.warning(f"{self.name} circuit opened after {self._consecutive_failures} consecutive failures")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def _record(self, response, latency, adaptive):
+        if _is_failure_response(response):
+            self._record_failure()
+        else:
+            # Only adaptive calls feed the latency window their timeouts are derived from
+            self._record_success(latency if adaptive else None)
+
+    # -- calls -----------------------------------------------------------
+
+    async def call_async(self, send, adaptive=True):
+        """
+        send(timeout) returns an awaitable response. For non-adaptive calls
+        timeout is None, meaning the caller's static timeout.
+        """
+        self._before_call()
+        timeout = self.timeout() if adaptive else None
+        delay = self.hedge_delay() if adaptive else None
+        start = time.monotonic()
+        tasks = [asyncio.ensure_future(send(timeout))]
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    self.hedged_requests += 1
+                    tasks.append(asyncio.ensure_future(send(timeout)))
+            response = await _first_success_async(tasks)
+        except BaseException:
+            self._record_failure()
+            raise
+        finally:
+            for task in tasks:
+                task.cancel()
+        self._record(response, time.monotonic() - start, adaptive)
+        return response
+
+    def call_sync(self, send, adaptive=False):
+        """Blocking counterpart of call_async; send(timeout) returns a response"""
+        self._before_call()
+        timeout = self.timeout() if adaptive else None
+        delay = self.hedge_delay() if adaptive else None
+        start = time.monotonic()
+        try:
+            if delay is None:
+                response = send(timeout)
+            else:
+                futures = [_hedge_pool.submit(send, timeout)]
+                done, _ = wait(futures, timeout=delay)
+                if not done:
+                    self.hedged_requests += 1
+                    futures.append(_hedge_pool.submit(send, timeout))
+                response = _first_success_sync(futures)
+        except BaseException:
+            self._record_failure()
+            raise
+        self._record(response, time.monotonic() - start, adaptive)
+        return response
+
+    def stats(self):
+        percentiles = self.percentiles()
+        return {
+            "state": self.state,
+            "timeout": self.timeout(),
+            "p50": percentiles.get(50),
+            "p95": percentiles.get(95),
+            "p99": percentiles.get(99),
+            "hedged_requests": self.hedged_requests,
+            "failures": self.failures,
+            "rejected": self.rejected,
+        }
+
+
+async def _first_success_async(tasks):
+    pending = set(tasks)
+    error = None
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is None:
+                return task.result()
+            error = task.exception()
+    raise error
+
+
+def _first_success_sync(futures):
+    pending = set(futures)
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+    raise error
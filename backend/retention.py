@@ -0,0 +1,207 @@
+"""
+Retention for price history.
+
+Raw snapshots (price_logs headers and price_ticks) are kept for
+RETENTION_TICKS_DAYS, candles for a per-resolution period
+(CANDLE_RETENTION_DAYS, None = forever). prune() runs as a background job and
+deletes expired rows in small batches, committing between batches so the
+persist stage is never blocked behind one huge DELETE.
+
+On PostgreSQL price_ticks is range-partitioned by day: ensure_partitions()
+creates the next PARTITION_DAYS_AHEAD daily partitions (plus a default one so
+writes never fail), and prune() drops whole expired partitions before the
+batched delete cleans up whatever is left. On SQLite freed pages are reused
+by new rows, so the file stays flat once retention has caught up.
+
+With the columnar archive enabled (archive.py), closed days are archived
+first and raw ticks are only pruned up to the first unarchived day.
+"""
+
+import os
+import time
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import text, select, delete, func
+
+from models import engine, WriteSession, PriceLog, PriceTick, PriceCandle
+from rollups import RESOLUTIONS
+import archive
+
+logger = logging.getLogger(__name__)
+
+
+def _days(name, default):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return None if value.lower() in ("", "none", "forever") else int(value)
+
+
+RETENTION_TICKS_DAYS = _days("RETENTION_TICKS_DAYS", 30)
+CANDLE_RETENTION_DAYS = {
+    "1m": _days("RETENTION_CANDLES_1M_DAYS", 90),
+    "5m": _days("RETENTION_CANDLES_5M_DAYS", 365),
+    "1h": _days("RETENTION_CANDLES_1H_DAYS", 5 * 365),
+    "1d": _days("RETENTION_CANDLES_1D_DAYS", None),
+}
+
+RETENTION_INTERVAL_SECONDS = 3600
+
+PRUNE_BATCH_SIZE = 500      # Snapshots (or candle buckets) deleted per transaction
+PRUNE_BATCH_PAUSE = 0.05    # Seconds between batches, lets the writer in
+
+PARTITION_DAYS_AHEAD = 7
+PARTITION_PREFIX = "price_ticks_p"
+
+
+def _is_postgres():
+    return engine.dialect.name == "postgresql"
+
+
+# -- PostgreSQL partitions ----------------------------------------------------
+
+def _ticks_partitioned(conn):
+    return conn.execute(text("SELECT relkind FROM pg_class WHERE relname = 'price_ticks'")).scalar() == "p"
+
+
+def _partitions(conn):
+    """{day: partition name} of the daily price_ticks partitions"""
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = 'price_ticks'"
+    )).scalars()
+    days = {}
+    for name in names:
+        if name.startswith(PARTITION_PREFIX):
+            try:
+                days[datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m%d")] = name
+            except ValueError:
+                pass
+    return days
+
+
+def ensure_partitions(days_ahead=PARTITION_DAYS_AHEAD):
+    """
+    Create today's and the next days_ahead daily price_ticks partitions
+    (PostgreSQL only). Each partition is created in its own transaction, so a
+    day that fails is logged and retried by the next run without holding up
+    the others.
+    """
+    if not _is_postgres():
+        return
+    with engine.begin() as conn:
+        if not _ticks_partitioned(conn):
+            logger.warning("price_ticks is not partitioned (created before partitioning); pruning uses batched deletes")
+            return
+        conn.execute(text("CREATE TABLE IF NOT EXISTS price_ticks_default PARTITION OF price_ticks DEFAULT"))
+        existing = _partitions(conn)
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    for offset in range(days_ahead + 1):
+        day = today + timedelta(days=offset)
+        if day in existing:
+            continue
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {PARTITION_PREFIX}{day:%Y%m%d} PARTITION OF price_ticks "
+                    f"FOR VALUES FROM ('{day:%Y-%m-%d}') TO ('{day + timedelta(days=1):%Y-%m-%d}')"
+                ))
+            logger.info(f"Created partition {PARTITION_PREFIX}{day:%Y%m%d}")
+        except Exception as e:
+            logger.error(f"Error creating partition {PARTITION_PREFIX}{day:%Y%m%d}: {e}")
+
+
+def _drop_expired_partitions(cutoff):
+    with engine.begin() as conn:
+        if not _ticks_partitioned(conn):
+            return 0
+        dropped = 0
+        for day, name in sorted(_partitions(conn).items()):
+            if day + timedelta(days=1) <= cutoff:
+                conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                logger.info(f"Dropped expired partition {name}")
+                dropped += 1
+        return dropped
+
+
+# -- batched pruning ----------------------------------------------------------
+
+def _prune_snapshots(cutoff):
+    """Delete headers and ticks older than cutoff, oldest first, PRUNE_BATCH_SIZE snapshots at a time"""
+    deleted = 0
+    while True:
+        db = WriteSession()
+        try:
+            # Walk the primary key from the oldest row; price_logs.timestamp is not indexed
+            batch = db.execute(
+                select(PriceLog.id, PriceLog.timestamp).order_by(PriceLog.id).limit(PRUNE_BATCH_SIZE)
+            ).all()
+            expired = [(log_id, ts) for log_id, ts in batch if ts is not None and ts < cutoff]
+            if not expired:
+                return deleted
+            last_id = expired[-1][0]
+            newest = max(ts for _, ts in expired)
+            db.execute(delete(PriceTick).where(PriceTick.timestamp <= newest, PriceTick.timestamp < cutoff))
+            db.execute(delete(PriceLog).where(PriceLog.id <= last_id, PriceLog.timestamp < cutoff))
+            db.commit()
+            deleted += len(expired)
+            if len(expired) < len(batch):
+                return deleted
+        finally:
+            db.close()
+        time.sleep(PRUNE_BATCH_PAUSE)
+
+
+def _prune_candles(resolution, cutoff):
+    """Delete candles of one resolution older than cutoff, PRUNE_BATCH_SIZE buckets at a time"""
+    window = timedelta(seconds=RESOLUTIONS[resolution] * PRUNE_BATCH_SIZE)
+    deleted = 0
+    while True:
+        db = WriteSession()
+        try:
+            oldest = db.execute(
+                select(func.min(PriceCandle.bucket_start)).where(PriceCandle.resolution == resolution)
+            ).scalar()
+            if oldest is None or oldest >= cutoff:
+                return deleted
+            result = db.execute(delete(PriceCandle).where(
+                PriceCandle.resolution == resolution,
+                PriceCandle.bucket_start < min(cutoff, oldest + window),
+            ))
+            db.commit()
+            deleted += result.rowcount or 0
+        finally:
+            db.close()
+        time.sleep(PRUNE_BATCH_PAUSE)
+
+
+def prune():
+    """Background job: apply the retention policy"""
+    start_time = time.time()
+    now = datetime.now()
+    summary = []
+    try:
+        if RETENTION_TICKS_DAYS is not None:
+            cutoff = now - timedelta(days=RETENTION_TICKS_DAYS)
+            if archive.ARCHIVE_ENABLED:
+                # Cold tier: never prune a day that is not in the archive yet
+                summary.append(f"days archived={archive.archive_closed_days()}")
+                cutoff = archive.archived_cutoff(cutoff)
+            if _is_postgres():
+                summary.append(f"partitions dropped={_drop_expired_partitions(cutoff)}")
+            summary.append(f"snapshots={_prune_snapshots(cutoff)}")
+        for resolution, days in CANDLE_RETENTION_DAYS.items():
+            if days is not None:
+                summary.append(f"candles {resolution}={_prune_candles(resolution, now - timedelta(days=days))}")
+    except Exception as e:
+        logger.error(f"Error pruning price history: {e}")
+        return
+    finally:
+        # Independent of pruning: a failed prune must not leave tomorrow without a partition
+        if _is_postgres():
+            try:
+                ensure_partitions()
+            except Exception as e:
+                logger.error(f"Error creating price_ticks partitions: {e}")
+    logger.info(f"Retention pruned {', '.join(summary)} in {time.time() - start_time:.2f}s")
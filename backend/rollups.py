@@ -0,0 +1,188 @@
+"""
+Incremental OHLC rollups of price ticks.
+
+Every batch of snapshots written by tick_store also upserts its ticks into
+the price_candles table at each resolution in RESOLUTIONS, in the same
+transaction. candles() then serves long ranges from pre-aggregated rows, and
+choose_resolution() picks the finest resolution whose point count fits the
+caller's budget, falling back to raw ticks for short ranges. series() serves
+chart history as column arrays, LTTB-downsampled to a point budget.
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, case, func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import PriceCandle, PriceTick
+from downsample import lttb
+
+logger = logging.getLogger(__name__)
+
+RAW = "raw"
+
+# Resolution name -> bucket width in seconds, finest first
+RESOLUTIONS = {
+    "1m": 60,
+    "5m": 300,
+    "1h": 3600,
+    "1d": 86400,
+}
+
+# Spacing of raw ticks, used to estimate raw point counts; scheduler persists at this interval
+RAW_INTERVAL_SECONDS = 5
+
+DEFAULT_MAX_POINTS = 500
+
+# series() reads up to this many times the point budget, then LTTB keeps the best max_points
+SERIES_OVERSAMPLE = 10
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def bucket_start(timestamp, seconds):
+    offset = (timestamp - _EPOCH).total_seconds() % seconds
+    return timestamp - timedelta(seconds=offset)
+
+
+def _upsert(db):
+    if db.get_bind().dialect.name == "postgresql":
+        insert, greatest, least = postgresql.insert, func.greatest, func.least
+    else:
+        # SQLite's two-argument max()/min() are scalar functions
+        insert, greatest, least = sqlite.insert, func.max, func.min
+
+    stmt = insert(PriceCandle)
+    excluded = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=["resolution", "symbol", "exchange", "bucket_start"],
+        set_={
+            "open": case((excluded.first_at < PriceCandle.first_at, excluded.open), else_=PriceCandle.open),
+            "first_at": least(PriceCandle.first_at, excluded.first_at),
+            "high": greatest(PriceCandle.high, excluded.high),
+            "low": least(PriceCandle.low, excluded.low),
+            "close": case((excluded.last_at >= PriceCandle.last_at, excluded.close), else_=PriceCandle.close),
+            "last_at": greatest(PriceCandle.last_at, excluded.last_at),
+            "count": PriceCandle.count + excluded.count,
+        },
+    )
+
+
+def update_candles(db, ticks):
+    """Fold tick rows ({symbol, exchange, timestamp, price}) into every resolution; the caller commits"""
+    if not ticks:
+        return
+    # Pre-aggregate per candle so one (multi-row) upsert never touches the same key twice
+    rows = {}
+    for name, seconds in RESOLUTIONS.items():
+        for tick in ticks:
+            price, timestamp = tick["price"], tick["timestamp"]
+            key = (name, tick["symbol"], tick["exchange"], bucket_start(timestamp, seconds))
+            row = rows.get(key)
+            if row is None:
+                rows[key] = {
+                    "resolution": name, "symbol": key[1], "exchange": key[2], "bucket_start": key[3],
+                    "open": price, "high": price, "low": price, "close": price,
+                    "count": 1, "first_at": timestamp, "last_at": timestamp,
+                }
+                continue
+            row["high"] = max(row["high"], price)
+            row["low"] = min(row["low"], price)
+            row["count"] += 1
+            if timestamp < row["first_at"]:
+                row["open"], row["first_at"] = price, timestamp
+            if timestamp >= row["last_at"]:
+                row["close"], row["last_at"] = price, timestamp
+    db.execute(_upsert(db), list(rows.values()))
+
+
+def point_count(start, end, resolution):
+    """Estimated number of points of one series at resolution over [start, end]"""
+    span = max((end - start).total_seconds(), 0)
+    return span / (RAW_INTERVAL_SECONDS if resolution == RAW else RESOLUTIONS[resolution])
+
+
+def choose_resolution(start, end, max_points=DEFAULT_MAX_POINTS):
+    """Finest resolution (raw ticks first) whose number of points over [start, end] fits max_points"""
+    for name in (RAW, *RESOLUTIONS):
+        if point_count(start, end, name) <= max_points:
+            return name
+    return list(RESOLUTIONS)[-1]
+
+
+def candles(db, symbol, exchange, start, end, resolution):
+    """[{timestamp, open, high, low, close, count}] oldest first; raw ticks become one-tick candles"""
+    symbol = symbol.upper()
+    if resolution == RAW:
+        rows = db.execute(
+            select(PriceTick.timestamp, PriceTick.price)
+            .where(PriceTick.symbol == symbol, PriceTick.exchange == exchange,
+                   PriceTick.timestamp >= start, PriceTick.timestamp <= end)
+            .order_by(PriceTick.timestamp)
+        )
+        return [
+            {"timestamp": timestamp, "open": price, "high": price, "low": price, "close": price, "count": 1}
+            for timestamp, price in rows
+        ]
+
+    rows = db.execute(
+        select(PriceCandle.bucket_start, PriceCandle.open, PriceCandle.high,
+               PriceCandle.low, PriceCandle.close, PriceCandle.count)
+        .where(PriceCandle.resolution == resolution, PriceCandle.symbol == symbol,
+               PriceCandle.exchange == exchange,
+               PriceCandle.bucket_start >= bucket_start(start, RESOLUTIONS[resolution]),
+               PriceCandle.bucket_start <= end)
+        .order_by(PriceCandle.bucket_start)
+    )
+    return [
+        {"timestamp": ts, "open": o, "high": h, "low": l, "close": c, "count": n}
+        for ts, o, h, l, c, n in rows
+    ]
+
+
+def series(db, symbols, exchanges, start, end, max_points=DEFAULT_MAX_POINTS, resolution=None):
+    """
+    Price series of every (symbol, exchange) pair over [start, end] as
+    (resolution, [{symbol, exchange, t: [epoch ms], p: [price]}]), each
+    downsampled to at most max_points. Short ranges read raw ticks, longer
+    ones the closes of the finest candle resolution that fits, unless the
+    caller fixes resolution. Pairs without data are left out.
+    """
+    symbols = [symbol.upper() for symbol in symbols]
+    if resolution is None:
+        resolution = choose_resolution(start, end, max_points * SERIES_OVERSAMPLE)
+    if resolution == RAW:
+        query = (
+            select(PriceTick.symbol, PriceTick.exchange, PriceTick.timestamp, PriceTick.price)
+            .where(PriceTick.symbol.in_(symbols), PriceTick.exchange.in_(exchanges),
+                   PriceTick.timestamp >= start, PriceTick.timestamp <= end)
+            .order_by(PriceTick.symbol, PriceTick.exchange, PriceTick.timestamp)
+        )
+    else:
+        query = (
+            select(PriceCandle.symbol, PriceCandle.exchange, PriceCandle.bucket_start, PriceCandle.close)
+            .where(PriceCandle.resolution == resolution,
+                   PriceCandle.symbol.in_(symbols), PriceCandle.exchange.in_(exchanges),
+                   PriceCandle.bucket_start >= bucket_start(start, RESOLUTIONS[resolution]),
+                   PriceCandle.bucket_start <= end)
+            .order_by(PriceCandle.symbol, PriceCandle.exchange, PriceCandle.bucket_start)
+        )
+
+    columns = {}
+    for symbol, exchange, timestamp, price in db.execute(query):
+        times, prices = columns.setdefault((symbol, exchange), ([], []))
+        times.append(int(timestamp.timestamp() * 1000))
+        prices.append(price)
+
+    result = []
+    for symbol in symbols:
+        for exchange in exchanges:
+            if (symbol, exchange) not in columns:
+                continue
+            times, prices = columns[(symbol, exchange)]
+            if len(times) > max_points:
+                kept = lttb(times, prices, max_points)
+                times, prices = [times[i] for i in kept], [prices[i] for i in kept]
+            result.append({"symbol": symbol, "exchange": exchange, "t": times, "p": prices})
+    return resolution, result
@@ -16,6 +16,14 @@ REM 의존성 설치 확인
 echo 의존성 확인 중...
 pip install -q -r requirements.txt
 
+REM 아카이브/스풀 저장 위치 (Docker에서는 /data 볼륨)
+if not defined DATA_DIR set "DATA_DIR=%cd%\data"
+
+REM 데이터베이스 스키마 업그레이드
+echo 스키마 마이그레이션 적용 중...
+python migrations\upgrade.py
+if errorlevel 1 exit /b 1
+
 REM FastAPI 서버 실행
 echo FastAPI 서버 시작 중...
 echo 서버 주소: http://localhost:8000
@@ -47,6 +47,16 @@ def main():
         except subprocess.CalledProcessError as e:
             print(f"⚠ 의존성 설치 중 오류 발생: {e}")
     
+    # 아카이브/스풀 저장 위치 (Docker에서는 /data 볼륨)
+    os.environ.setdefault("DATA_DIR", str(script_dir.resolve() / "data"))
+
+    # 데이터베이스 스키마 업그레이드
+    print("\n스키마 마이그레이션 적용 중...")
+    result = subprocess.run([str(python_exe), "migrations/upgrade.py"])
+    if result.returncode != 0:
+        print("⚠ 스키마 마이그레이션 실패")
+        sys.exit(1)
+    
     # FastAPI 서버 실행
     print("\n" + "=" * 60)
     print("FastAPI 서버 시작 중...")
@@ -18,6 +18,13 @@ fi
 echo "의존성 확인 중..."
 pip install -q -r requirements.txt
 
+# 아카이브/스풀 저장 위치 (Docker에서는 /data 볼륨)
+export DATA_DIR="${DATA_DIR:-$(pwd)/data}"
+
+# 데이터베이스 스키마 업그레이드
+echo "스키마 마이그레이션 적용 중..."
+python migrations/upgrade.py || exit 1
+
 # FastAPI 서버 실행
 echo "FastAPI 서버 시작 중..."
 echo "서버 주소: http://localhost:8000"
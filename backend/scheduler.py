@@ -1,267 +1,205 @@
 from apscheduler.schedulers.background import BackgroundScheduler
-import requests
-import urllib3
+import asyncio
 import logging
-from models import SessionLocal, PriceLog
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from ingestion import (
+    engine as ingestion_engine, fetch_bithumb_prices, fetch_binance_prices, fetch_korbit_prices,
+)
+from fx_rate import fx_rate_provider
+from market_state import market_state
+from coin_universe import coin_universe
+from listings import symbol_listings, LISTING_FETCHERS, LISTINGS_REFRESH_SECONDS
+from streaming import MARKET_DATA_MODE, stream_manager
+import metrics
+from tick_writer import tick_writer
+from price_snapshot import price_snapshot
+from price_stream import broker
+import tick_store
+import retention
+from rollups import RAW_INTERVAL_SECONDS
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Disable SSL warnings
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
 scheduler = BackgroundScheduler()
 
-# Cache for top 30 coins
-top_coins_cache = []
-last_cache_update = datetime.min
+# Each exchange is ingested by its own job, so a slow Binance
+# call no longer delays fresh Bithumb/Korbit prices.
+#   interval:    seconds between runs
+#   timeout:     budget for one run; the fetch is cancelled when exceeded
+#   stale_after: prices older than this are persisted as 0.0
+INGESTION_JOBS = {
+    "bithumb": {"fetch": fetch_bithumb_prices, "interval": 1, "timeout": 5, "stale_after": 30},
+    "binance": {"fetch": fetch_binance_prices, "interval": 5, "timeout": 11, "stale_after": 60},
+    "korbit": {"fetch": fetch_korbit_prices, "interval": 2, "timeout": 7, "stale_after": 30},
+}
 
-def get_top_30_coins():
-    global top_coins_cache, last_cache_update
-    
-    # Update cache every hour
-    if (datetime.now() - last_cache_update).total_seconds() < 3600 and top_coins_cache:
-        return top_coins_cache
+# How often the FX job checks whether the cached USD/KRW rate has expired
+FX_RATE_CHECK_SECONDS = 300
 
-    try:
-        url = "https://api.coingecko.com/api/v3/coins/markets"
-        params = {
-            "vs_currency": "usd",
-            "order": "market_cap_desc",
-            "per_page": 30,
-            "page": 1,
-            "sparkline": "false"
-        }
-        response = requests.get(url, params=params, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            # Store symbol and name
-            top_coins_cache = [
-                {"symbol": coin["symbol"].upper(), "name": coin["name"], "id": coin["id"]} 
-                for coin in data
-            ]
-            last_cache_update = datetime.now()
-            logger.info(f"Updated top 30 coins cache: {[c['symbol'] for c in top_coins_cache]}")
-            return top_coins_cache
-        else:
-            logger.error(f"Failed to fetch top coins from CoinGecko: {response.status_code}")
-            return top_coins_cache # Return old cache if failed
-    except Exception as e:
-        logger.error(f"Error fetching top coins: {e}")
-        return top_coins_cache
+# Interval of the stage that turns the shared latest state into PriceLog rows;
+# defined in rollups, which estimates raw point counts from it
+PERSIST_INTERVAL_SECONDS = RAW_INTERVAL_SECONDS
+
+def get_tracked_symbols():
+    # Never blocks: serves the last good list (or the defaults) while it refreshes
+    return [coin['symbol'] for coin in coin_universe.get()]
 
-def fetch_market_data():
+def ingest_exchange(name):
+    """Ingestion job for one exchange: fetch and publish to market_state"""
     import time
+    job = INGESTION_JOBS[name]
     start_time = time.time()
-    step_times = {}
-    step_start = time.time()
-    
-    db = SessionLocal()
     try:
-        # 1. Fetch USD/KRW exchange rate
-        usd_krw_rate = 1300.0
-        try:
-            response = requests.get("https://api.frankfurter.app/latest?from=USD&to=KRW", verify=False, timeout=5)
-            data = response.json()
-            if "rates" in data and "KRW" in data["rates"]:
-                usd_krw_rate = data["rates"]["KRW"]
-        except Exception as e:
-            logger.warning(f"Error fetching Exchange rate: {e}")
-        step_times['exchange_rate'] = time.time() - step_start
-        
-        # 2. Get Top 30 Coins
-        step_start = time.time()
-        top_coins = get_top_30_coins()
-        step_times['get_coins'] = time.time() - step_start
-        if not top_coins:
-            # Fallback to default if cache is empty
-            top_coins = [
-                {"symbol": "BTC", "name": "Bitcoin"}, {"symbol": "ETH", "name": "Ethereum"},
-                {"symbol": "XRP", "name": "XRP"}, {"symbol": "SOL", "name": "Solana"},
-                {"symbol": "USDT", "name": "Tether"}, {"symbol": "DOGE", "name": "Dogecoin"}
-            ]
+        if MARKET_DATA_MODE == "stream" and stream_manager.is_live(name):
+            # The WebSocket stream is keeping this exchange fresh; REST is only a fallback
+            return
 
-        market_data = {}
-        
-        # 3. Fetch Bithumb prices (KRW) - Parallel execution for better performance
-        def fetch_bithumb_price(symbol):
-            """Fetch price for a single symbol from Bithumb"""
-            try:
-                # Reduced timeout from 2s to 1s for faster failure handling
-                response = requests.get(f"https://api.bithumb.com/public/ticker/{symbol}_KRW", verify=False, timeout=1)
-                data = response.json()
-                price = 0.0
-                if data.get("status") == "0000":
-                    price = float(data["data"]["closing_price"])
-                return symbol, price
-            except requests.exceptions.Timeout:
-                # Timeout is expected for some coins, return 0.0
-                return symbol, 0.0
-            except Exception as e:
-                # logger.error(f"Error fetching Bithumb {symbol} price: {e}")
-                return symbol, 0.0
-        
-        # Use ThreadPoolExecutor to fetch prices in parallel
-        # Increased max_workers to 30 to fetch all coins simultaneously
-        step_start = time.time()
-        with ThreadPoolExecutor(max_workers=30) as executor:
-            futures = {executor.submit(fetch_bithumb_price, coin['symbol']): coin['symbol'] for coin in top_coins}
-            for future in as_completed(futures):
-                symbol, price = future.result()
-                if symbol not in market_data:
-                    market_data[symbol] = {}
-                market_data[symbol]['bithumb'] = price
-                market_data[symbol]['bithumb_krw'] = price
-        step_times['bithumb_prices'] = time.time() - step_start
+        # Skip symbols the exchange is known not to list
+        symbols = symbol_listings.listed(name, get_tracked_symbols())
+        with metrics.observe(metrics.INGESTION_FETCH_SECONDS, name):
+            prices = ingestion_engine.run(lambda: job["fetch"](symbols), timeout=job["timeout"])
+        if prices is None:
+            # Keep the previous prices; they are dropped once older than stale_after
+            metrics.INGESTION_ERRORS.labels(name).inc()
+            return
+        market_state.update_prices(name, prices)
+        logger.debug(f"Ingested {name} prices for {len(prices)} coins in {time.time() - start_time:.2f}s")
+    except asyncio.TimeoutError:
+        metrics.INGESTION_TIMEOUTS.labels(name).inc()
+        logger.warning(f"{name} ingestion exceeded its {job['timeout']}s budget")
+    except Exception as e:
+        metrics.INGESTION_ERRORS.labels(name).inc()
+        logger.error(f"Error ingesting {name}: {e}")
 
-        # Update USD/KRW if USDT is available on Bithumb
-        if usd_krw_rate == 1300.0 and market_data.get('USDT', {}).get('bithumb', 0) > 1000:
-            usd_krw_rate = market_data['USDT']['bithumb']
+def refresh_listings():
+    """Rebuild the per-exchange symbol-listing index from each exchange's market list"""
+    async def fetch_all():
+        names = list(LISTING_FETCHERS)
+        results = await asyncio.gather(*(LISTING_FETCHERS[name]() for name in names), return_exceptions=True)
+        return dict(zip(names, results))
 
-        # 4. Fetch Binance prices (USDT) - with optimized timeout and single retry
-        step_start = time.time()
-        binance_map = {}
-        # Binance API can be slow, use longer timeout but only retry once
-        max_retries = 1  # Reduced from 2 to 1 to avoid long delays
-        for attempt in range(max_retries + 1):  # +1 because we want max_retries retries (0, 1 = 2 attempts total)
-            try:
-                # Increased timeout to 5s as Binance API can be slow
-                response = requests.get("https://api.binance.com/api/v3/ticker/price", verify=False, timeout=5)
-                data = response.json()
-                binance_map = {item['symbol']: float(item['price']) for item in data if item['symbol'].endswith('USDT')}
-                break  # Success, exit retry loop
-            except requests.exceptions.Timeout:
-                if attempt < max_retries:
-                    logger.warning(f"Binance API timeout (attempt {attempt + 1}/{max_retries + 1}), retrying...")
-                    continue
-                else:
-                    logger.warning(f"Binance API timeout after {max_retries + 1} attempts, continuing without Binance data")
-                    # Continue without Binance data rather than blocking
-            except Exception as e:
-                logger.error(f"Error fetching Binance prices: {e}")
-                break  # Don't retry on other errors
-        
-        # Process results even if some requests failed
-        for coin in top_coins:
-            symbol = coin['symbol']
-            binance_symbol = f"{symbol}USDT"
-            price = binance_map.get(binance_symbol, 0.0)
-            
-            if symbol not in market_data: market_data[symbol] = {}
-            market_data[symbol]['binance'] = price
-            market_data[symbol]['binance_usdt'] = price
-        
-        step_times['binance_prices'] = time.time() - step_start
+    try:
+        results = ingestion_engine.run(fetch_all, timeout=30)
+    except Exception as e:
+        logger.error(f"Error refreshing exchange listings: {e}")
+        return
+    for name, result in results.items():
+        if isinstance(result, Exception) or not result:
+            logger.warning(f"Could not refresh {name} listing, keeping previous index: {result}")
+            continue
+        symbol_listings.update(name, result)
+        unlisted = sorted(symbol_listings.unlisted(name, get_tracked_symbols()))
+        logger.info(f"{name} lists {len(result)} markets; not listed among tracked coins: {unlisted}")
 
-        # 5. Fetch Korbit prices (KRW) - with optimized timeout and single retry
-        step_start = time.time()
-        korbit_data = {}
-        max_retries = 1  # Reduced from 2 to 1 to avoid long delays
-        for attempt in range(max_retries + 1):  # +1 because we want max_retries retries
-            try:
-                # Keep timeout at 3s as Korbit is usually faster
-                response = requests.get("https://api.korbit.co.kr/v1/ticker/detailed/all", verify=False, timeout=3)
-                korbit_data = response.json()
-                break  # Success, exit retry loop
-            except requests.exceptions.Timeout:
-                if attempt < max_retries:
-                    logger.warning(f"Korbit API timeout (attempt {attempt + 1}/{max_retries + 1}), retrying...")
-                    continue
-                else:
-                    logger.warning(f"Korbit API timeout after {max_retries + 1} attempts, continuing without Korbit data")
-                    # Continue without Korbit data rather than blocking
-            except Exception as e:
-                logger.error(f"Error fetching Korbit prices: {e}")
-                break  # Don't retry on other errors
-        
-        # Process results even if some requests failed
-        for coin in top_coins:
-            symbol = coin['symbol']
-            key = f"{symbol.lower()}_krw"
-            price = 0.0
-            if key in korbit_data:
-                price = float(korbit_data[key].get('last', 0))
-            
-            if symbol not in market_data: market_data[symbol] = {}
-            market_data[symbol]['korbit'] = price
-            market_data[symbol]['korbit_krw'] = price
-        
-        step_times['korbit_prices'] = time.time() - step_start
+def persist_market_data():
+    """Persist stage: snapshot the latest shared state and hand it to the tick writer"""
+    import time
+    start_time = time.time()
+    
+    try:
+        symbols = get_tracked_symbols()
+        stale_after = {name: job["stale_after"] for name, job in INGESTION_JOBS.items() if "stale_after" in job}
+        unlisted = {name: symbol_listings.unlisted(name, symbols) for name in LISTING_FETCHERS}
+        market_data = market_state.snapshot(symbols, stale_after, unlisted)
+        # Cached/derived rate; never waits on the FX source
+        usd_krw_rate = fx_rate_provider.current()
 
-        # 6. Log to Database
-        step_start = time.time()
-        # Maintain backward compatibility for fixed columns
-        bithumb_btc = market_data.get('BTC', {}).get('bithumb', 0)
+        bithumb_btc = market_data.get('BTC', {}).get('bithumb') or 0
         
-        if bithumb_btc > 0 or market_data.get('BTC', {}).get('binance', 0) > 0:
-            log = PriceLog(
-                # Legacy Bithumb
-                btc_price=market_data.get('BTC', {}).get('bithumb', 0),
-                eth_price=market_data.get('ETH', {}).get('bithumb', 0),
-                xrp_price=market_data.get('XRP', {}).get('bithumb', 0),
-                sol_price=market_data.get('SOL', {}).get('bithumb', 0),
-                usdt_price=market_data.get('USDT', {}).get('bithumb', 0),
-                doge_price=market_data.get('DOGE', {}).get('bithumb', 0),
-                
-                # Legacy Binance
-                btc_binance=market_data.get('BTC', {}).get('binance', 0),
-                eth_binance=market_data.get('ETH', {}).get('binance', 0),
-                xrp_binance=market_data.get('XRP', {}).get('binance', 0),
-                sol_binance=market_data.get('SOL', {}).get('binance', 0),
-                doge_binance=market_data.get('DOGE', {}).get('binance', 0),
-                
-                # Legacy Korbit
-                btc_korbit=market_data.get('BTC', {}).get('korbit', 0),
-                eth_korbit=market_data.get('ETH', {}).get('korbit', 0),
-                xrp_korbit=market_data.get('XRP', {}).get('korbit', 0),
-                sol_korbit=market_data.get('SOL', {}).get('korbit', 0),
-                doge_korbit=market_data.get('DOGE', {}).get('korbit', 0),
-                
-                usd_krw_rate=usd_krw_rate,
-                market_data=market_data, # New JSON data
-                timestamp=datetime.now()
-            )
-            db.add(log)
-            db.commit()
-            step_times['db_save'] = time.time() - step_start
+        if bithumb_btc > 0 or (market_data.get('BTC', {}).get('binance') or 0) > 0:
+            timestamp = datetime.now()
+            # Served right away, whether or not the database write succeeds
+            published = price_snapshot.publish(tick_store.snapshot_to_legacy((timestamp, usd_krw_rate, market_data)))
+            if published:
+                broker.publish("price", published.current_body)
+            # Buffered and written in batches (header + price ticks) by the tick writer thread
+            tick_writer.submit(timestamp, usd_krw_rate, market_data)
             
-            execution_time = time.time() - start_time
-            logger.info(f"Logged Prices for {len(market_data)} coins. (Total: {execution_time:.2f}s)")
-            logger.info(f"  Breakdown: ExchangeRate={step_times.get('exchange_rate', 0):.2f}s, "
-                       f"GetCoins={step_times.get('get_coins', 0):.2f}s, "
-                       f"Bithumb={step_times.get('bithumb_prices', 0):.2f}s, "
-                       f"Binance={step_times.get('binance_prices', 0):.2f}s, "
-                       f"Korbit={step_times.get('korbit_prices', 0):.2f}s, "
-                       f"DBSave={step_times.get('db_save', 0):.2f}s")
-            
-            # Warn if execution takes longer than 80% of interval (20s * 0.8 = 16s)
-            # Current interval is 20s, execution typically takes ~12-13s
-            if execution_time > 16:
-                logger.warning(f"fetch_market_data took {execution_time:.2f}s, which exceeds 80% of the 20s interval. Consider optimizing or increasing the interval.")
+            ages = ", ".join(
+                f"{name}={age:.1f}s" if age is not None else f"{name}=n/a"
+                for name, age in [(name, market_state.age_seconds(name)) for name in INGESTION_JOBS]
+                + [("fx_rate", fx_rate_provider.age_seconds())]
+            )
+            logger.info(f"Queued prices for {len(market_data)} coins (writer queue: {tick_writer.queue_depth()}, data age: {ages})")
             
     except Exception as e:
-        logger.error(f"Error in fetch_market_data: {e}")
+        logger.error(f"Error in persist_market_data: {e}")
         import traceback
         traceback.print_exc()
     finally:
-        db.close()
+        metrics.PERSIST_TICK_SECONDS.observe(time.time() - start_time)
 
 def start_scheduler():
-    # Add job with max_instances=1 to prevent overlapping executions
+    # Serve the persisted coin list from the first tick instead of waiting on CoinGecko
+    coin_universe.load()
+    fx_rate_provider.load()
+    # PostgreSQL: price_ticks partitions must exist before the first snapshot is written
+    try:
+        retention.ensure_partitions()
+    except Exception as e:
+        # Not fatal: the retention job retries every RETENTION_INTERVAL_SECONDS
+        logger.error(f"Error creating price_ticks partitions: {e}")
+    tick_writer.start()
+
+    for name in INGESTION_JOBS:
+        metrics.register_price_age(name, lambda name=name: market_state.age_seconds(name))
+    metrics.register_price_age("fx_rate", fx_rate_provider.age_seconds)
+
+    # One job per exchange, each on its own cadence
+    # max_instances=1: a slow run of one job never overlaps itself, and never blocks other jobs
     # coalesce=True: If multiple executions are missed, only run once when scheduler catches up
-    # misfire_grace_time: Allow job to run even if it's slightly late
-    # Note: Execution takes ~13-14 seconds (Bithumb: ~1.8s, Binance: ~7-8s, Korbit: ~3s)
-    # Using 20 seconds to provide buffer for network delays and retries
+    # next_run_time=now: warm the shared state immediately instead of after the first interval
+    for name, job in INGESTION_JOBS.items():
+        scheduler.add_job(
+            ingest_exchange,
+            'interval',
+            args=[name],
+            id=f"ingest_{name}",
+            seconds=job["interval"],
+            max_instances=1,
+            coalesce=True,
+            misfire_grace_time=30,
+            next_run_time=datetime.now()
+        )
+    scheduler.add_job(
+        fx_rate_provider.refresh,
+        'interval',
+        id="refresh_fx_rate",
+        seconds=FX_RATE_CHECK_SECONDS,
+        max_instances=1,
+        coalesce=True,
+        next_run_time=datetime.now()
+    )
+    scheduler.add_job(
+        refresh_listings,
+        'interval',
+        id="refresh_listings",
+        seconds=LISTINGS_REFRESH_SECONDS,
+        max_instances=1,
+        coalesce=True,
+        next_run_time=datetime.now()
+    )
+    scheduler.add_job(
+        retention.prune,
+        'interval',
+        id="prune_history",
+        seconds=retention.RETENTION_INTERVAL_SECONDS,
+        max_instances=1,
+        coalesce=True
+    )
     scheduler.add_job(
-        fetch_market_data, 
+        persist_market_data, 
         'interval', 
-        seconds=20,  # Set to 20s based on actual execution time (~13-14s)
+        id="persist_market_data",
+        seconds=PERSIST_INTERVAL_SECONDS,
         max_instances=1,  # Only allow one instance to run at a time
         coalesce=True,    # If multiple executions are missed, only run once
         misfire_grace_time=30  # Allow job to run if it's up to 30 seconds late
     )
     scheduler.start()
-    logger.info("Scheduler started: fetch_market_data will run every 20 seconds")
+    if MARKET_DATA_MODE == "stream":
+        stream_manager.start(ingestion_engine.loop, get_tracked_symbols)
+    intervals = ", ".join(f"{name}={job['interval']}s" for name, job in INGESTION_JOBS.items())
+    logger.info(f"Scheduler started: ingestion ({intervals}), FX rate check every {FX_RATE_CHECK_SECONDS}s, persist every {PERSIST_INTERVAL_SECONDS}s")
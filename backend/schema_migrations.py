@@ -0,0 +1,150 @@
+"""
+Versioned schema migrations.
+
+Every applied migration is recorded in the schema_migrations table. The API
+only calls check() at startup: one query comparing the recorded version with
+HEAD, failing fast if the database is behind. Migrations are applied by an
+explicit step before the app starts (python migrations/upgrade.py, run by
+run.sh/run.py/run.bat and the Docker image), so workers never race to alter
+tables while booting.
+
+A fresh database gets the current models via create_all and is stamped at
+HEAD. An existing database runs the pending migrations in order, one
+transaction each; on PostgreSQL an advisory lock serializes concurrent
+upgraders. To change the schema, append (version, name, function) to
+MIGRATIONS; the function receives a connection inside the transaction and
+must also update the model in models.py.
+"""
+
+import logging
+
+from sqlalchemy import inspect, text, select, func, insert
+from sqlalchemy.exc import DBAPIError
+
+from models import Base, engine, SchemaMigration
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary constant identifying the upgrade lock among PostgreSQL advisory locks
+UPGRADE_LOCK_KEY = 0x636F696E
+
+
+def _add_missing_columns(conn, inspector, table, columns):
+    existing = {col["name"] for col in inspector.get_columns(table)}
+    for name, definition in columns.items():
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {definition}"))
+            logger.info(f"Added column {table}.{name}")
+
+
+def _baseline(conn):
+    """
+    Bring a database created before versioning up to the first version: new
+    tables via create_all, plus the column fixes init_db used to apply on
+    every startup.
+    """
+    Base.metadata.create_all(conn)
+    inspector = inspect(conn)
+    postgres = conn.dialect.name == "postgresql"
+
+    _add_missing_columns(conn, inspector, "price_logs", {
+        **{f"{coin}_{exchange}": "DOUBLE PRECISION DEFAULT 0.0"
+           for exchange in ("korbit", "binance") for coin in ("btc", "eth", "xrp", "sol", "doge")},
+        "market_data": "JSONB DEFAULT '{}'::jsonb" if postgres else "JSON DEFAULT '{}'",
+    })
+    _add_missing_columns(conn, inspector, "users", {"phone_number": "VARCHAR"})
+
+    api_key_columns = {col["name"] for col in inspector.get_columns("api_keys")}
+    if "user_id" not in api_key_columns:
+        conn.execute(text(
+            "ALTER TABLE api_keys ADD COLUMN user_id INTEGER" + (" REFERENCES users(id)" if postgres else "")
+        ))
+        # Existing keys belong to the first user
+        first_user = conn.execute(text("SELECT id FROM users ORDER BY id LIMIT 1")).scalar()
+        if first_user is not None:
+            conn.execute(text("UPDATE api_keys SET user_id = :user_id WHERE user_id IS NULL"), {"user_id": first_user})
+        logger.info("Added column api_keys.user_id")
+    for old, new in (("access_key", "api_key"), ("secret_key", "api_secret")):
+        if old in api_key_columns and new not in api_key_columns:
+            if postgres:
+                conn.execute(text(f"ALTER TABLE api_keys RENAME COLUMN {old} TO {new}"))
+                logger.info(f"Renamed column api_keys.{old} -> {new}")
+            else:
+                logger.warning(f"SQLite cannot rename api_keys.{old}; migrate it to {new} manually")
+    if "created_at" not in api_key_columns:
+        # SQLite cannot add a column with a non-constant default
+        conn.execute(text("ALTER TABLE api_keys ADD COLUMN created_at TIMESTAMP" + (" DEFAULT NOW()" if postgres else "")))
+        logger.info("Added column api_keys.created_at")
+
+
+def _snapshot_layout(conn):
+    """price_logs.layout: tracked and unlisted symbols at write time"""
+    _add_missing_columns(conn, inspect(conn), "price_logs", {"layout": "JSON"})
+
+
+# (version, name, function), in order; never edit or reorder applied entries
+MIGRATIONS = [
+    (1, "baseline", _baseline),
+    (2, "snapshot_layout", _snapshot_layout),
+]
+
+HEAD = MIGRATIONS[-1][0]
+
+
+def _lock(conn):
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": UPGRADE_LOCK_KEY})
+
+
+def _version(conn):
+    return conn.execute(select(func.max(SchemaMigration.version))).scalar() or 0
+
+
+def current_version():
+    """Applied schema version (0 if none recorded yet); a single query"""
+    with engine.connect() as conn:
+        return _version(conn)
+
+
+def check():
+    """Startup check: raise unless the database is at HEAD"""
+    try:
+        version = current_version()
+    except DBAPIError as e:
+        raise RuntimeError(
+            f"Could not read the schema version ({e.orig}); run `python migrations/upgrade.py` first"
+        ) from e
+    if version < HEAD:
+        raise RuntimeError(
+            f"Database schema is at version {version}, this code needs {HEAD}; "
+            f"run `python migrations/upgrade.py` first"
+        )
+    if version > HEAD:
+        logger.warning(f"Database schema version {version} is newer than this code ({HEAD})")
+    return version
+
+
+def upgrade():
+    """Apply pending migrations; returns the resulting version"""
+    with engine.begin() as conn:
+        _lock(conn)
+        SchemaMigration.__table__.create(conn, checkfirst=True)
+        if _version(conn) == 0 and not inspect(conn).has_table("price_logs"):
+            # Fresh database: the models are already the latest schema
+            Base.metadata.create_all(conn)
+            conn.execute(insert(SchemaMigration), [
+                {"version": version, "name": name} for version, name, _ in MIGRATIONS
+            ])
+            logger.info(f"Created schema at version {HEAD}")
+            return HEAD
+
+    for version, name, migrate in MIGRATIONS:
+        with engine.begin() as conn:
+            _lock(conn)
+            # Re-read under the lock: another upgrader may have applied it meanwhile
+            if version <= _version(conn):
+                continue
+            migrate(conn)
+            conn.execute(insert(SchemaMigration).values(version=version, name=name))
+            logger.info(f"Applied migration {version} ({name})")
+    return current_version()
@@ -0,0 +1,45 @@
+"""
+Price Archive Script
+
+Writes closed days of price ticks to the columnar archive (one Parquet file
+per day, see archive.py). The retention job does this automatically when the
+archive is enabled; use this script for a one-off export or to rewrite a day.
+
+Usage:
+    python scripts/archive_prices.py                    # archive all closed days not yet archived
+    python scripts/archive_prices.py --day 2025-01-31   # (re)write one day
+    python scripts/archive_prices.py --dir /data/archive
+
+Reading the archive (no database needed):
+    from archive import load_ticks
+    timestamps, prices = load_ticks("BTC", "bithumb", start=datetime(2025, 1, 1))
+    df = load_ticks("BTC", "binance", as_pandas=True)
+"""
+
+import sys
+import os
+import argparse
+from datetime import datetime
+
+# Add parent directory to path to import backend modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import archive
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export price ticks to the columnar archive")
+    parser.add_argument("--day", help="Day to (re)write, YYYY-MM-DD")
+    parser.add_argument("--dir", default=None, help=f"Archive directory (default: {archive.ARCHIVE_DIR})")
+    args = parser.parse_args()
+
+    if args.day:
+        day = datetime.strptime(args.day, "%Y-%m-%d")
+        count = archive.archive_day(day, args.dir)
+        print(f"✓ Archived {count} ticks to {archive.day_path(day, args.dir)}")
+    else:
+        print(f"✓ Archived {archive.archive_closed_days(args.dir)} day(s)")
+
+
+if __name__ == "__main__":
+    main()
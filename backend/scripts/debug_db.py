@@ -11,19 +11,19 @@ import os
 # Add parent directory to path to import backend modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from models import SessionLocal, PriceLog
-import json
+from models import SessionLocal
+import tick_store
 
 def debug():
     """Print the latest price log entry for debugging"""
     db = SessionLocal()
     try:
-        latest = db.query(PriceLog).order_by(PriceLog.id.desc()).first()
+        latest = tick_store.latest_snapshot(db)
         if latest:
-            print(f"Latest ID: {latest.id}")
-            print(f"Timestamp: {latest.timestamp}")
-            print(f"Market Data Type: {type(latest.market_data)}")
-            print(f"Market Data: {latest.market_data}")
+            print(f"Latest ID: {latest['id']}")
+            print(f"Timestamp: {latest['timestamp']}")
+            print(f"Market Data Type: {type(latest['market_data'])}")
+            print(f"Market Data: {latest['market_data']}")
         else:
             print("No records found.")
     except Exception as e:
@@ -0,0 +1,149 @@
+"""
+WebSocket Replay Server
+
+Local stand-in for the exchange ticker WebSockets used by streaming.py.
+It replays recorded messages so the streaming ingestion mode can be tested
+and benchmarked offline.
+
+Usage:
+    # Replay the bundled sample at recorded speed, looping forever
+    python scripts/ws_replay_server.py serve --loop
+
+    # Benchmark: replay as fast as possible
+    python scripts/ws_replay_server.py serve --speed 0 --loop
+
+    # Record 60 seconds of live ticker messages
+    python scripts/ws_replay_server.py record --seconds 60 --out recording.jsonl
+
+Then start the backend with:
+    MARKET_DATA_MODE=stream \\
+    BITHUMB_WS_URL=ws://localhost:8765/bithumb \\
+    BINANCE_WS_URL=ws://localhost:8765/binance \\
+    KORBIT_WS_URL=ws://localhost:8765/korbit \\
+    uvicorn main:app
+
+Recording format (JSON lines): {"t": <seconds since start>, "exchange": "...", "message": {...}}
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import json
+import time
+
+# Add parent directory to path to import backend modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import websockets
+from websockets.asyncio.server import serve
+
+DEFAULT_RECORDING = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "ws_ticker_sample.jsonl")
+
+
+def load_recording(path):
+    """Load a recording and group it by exchange"""
+    by_exchange = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                by_exchange.setdefault(entry["exchange"], []).append(entry)
+    return by_exchange
+
+
+async def drain(ws):
+    # Subscription requests are accepted and ignored
+    async for _ in ws:
+        pass
+
+
+async def replay(ws, entries, speed, loop_forever):
+    sent = 0
+    start = time.monotonic()
+    while True:
+        previous_t = entries[0]["t"] if entries else 0
+        for entry in entries:
+            # sleep(0) still yields, so one fast replay cannot starve other connections
+            await asyncio.sleep(max(0.0, (entry["t"] - previous_t) / speed) if speed > 0 else 0)
+            previous_t = entry["t"]
+            await ws.send(json.dumps(entry["message"]))
+            sent += 1
+        if not loop_forever:
+            break
+    elapsed = time.monotonic() - start
+    print(f"Replayed {sent} messages in {elapsed:.2f}s ({sent / elapsed if elapsed else 0:.0f} msg/s)")
+
+
+async def run_server(args):
+    recording = load_recording(args.recording)
+    print(f"Loaded {sum(len(v) for v in recording.values())} messages for {', '.join(sorted(recording))}")
+
+    async def handler(ws):
+        exchange = ws.request.path.strip("/").split("/")[0]
+        if exchange not in recording:
+            await ws.close(code=1008, reason=f"no recording for '{exchange}'")
+            return
+        print(f"Client connected: {exchange}")
+        drainer = asyncio.create_task(drain(ws))
+        try:
+            await replay(ws, recording[exchange], args.speed, args.loop)
+        except websockets.ConnectionClosed:
+            print(f"Client disconnected: {exchange}")
+        finally:
+            drainer.cancel()
+
+    async with serve(handler, args.host, args.port):
+        print(f"Replay server listening on ws://{args.host}:{args.port}/<exchange>")
+        await asyncio.Future()
+
+
+async def run_recorder(args):
+    from streaming import STREAMS
+
+    symbols = [s.strip().upper() for s in args.symbols.split(",")]
+    start = time.monotonic()
+    lock = asyncio.Lock()
+
+    with open(args.out, "w") as out:
+        async def record(name, spec):
+            async with websockets.connect(spec["url"], max_size=2 ** 22) as ws:
+                for payload in spec["subscribe"](symbols):
+                    await ws.send(json.dumps(payload))
+                async for raw in ws:
+                    async with lock:
+                        out.write(json.dumps({"t": round(time.monotonic() - start, 3), "exchange": name, "message": json.loads(raw)}) + "\n")
+
+        tasks = [asyncio.create_task(record(name, spec)) for name, spec in STREAMS.items()]
+        await asyncio.sleep(args.seconds)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    print(f"Recording written to {args.out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay (or record) exchange ticker WebSocket messages")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = sub.add_parser("serve", help="Replay a recording over WebSocket")
+    serve_parser.add_argument("--recording", default=DEFAULT_RECORDING)
+    serve_parser.add_argument("--host", default="localhost")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--speed", type=float, default=1.0, help="Playback speed multiplier (0 = no delay)")
+    serve_parser.add_argument("--loop", action="store_true", help="Repeat the recording until the client disconnects")
+
+    record_parser = sub.add_parser("record", help="Record live ticker messages from the exchanges")
+    record_parser.add_argument("--symbols", default="BTC,ETH,XRP,SOL,USDT,DOGE")
+    record_parser.add_argument("--seconds", type=int, default=60)
+    record_parser.add_argument("--out", default="ws_recording.jsonl")
+
+    args = parser.parse_args()
+    try:
+        asyncio.run(run_server(args) if args.command == "serve" else run_recorder(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Durable local spool for snapshots that could not be written to the database.
+
+Records are appended to a single file as <4-byte big-endian length><JSON>
+and fsynced, so a database outage (or a crash during one) loses nothing.
+The tick writer appends failed batches here, keeps appending new batches
+behind them while the spool is non-empty (preserving order), and replays the
+file in bulk once the database accepts writes again. Replay skips snapshots
+whose timestamp is already stored, so a replay interrupted halfway can simply
+be run again. A truncated trailing record (crash mid-append) is cut off
+before the first append after a restart, so new records stay aligned.
+"""
+
+import os
+import json
+import struct
+import threading
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# On the data volume, outside the (bind-mounted) source tree, so it survives container rebuilds
+SPOOL_PATH = os.getenv("TICK_SPOOL_PATH", os.path.join(os.getenv("DATA_DIR", "/data"), "spool", "ticks.spool"))
+
+_LENGTH = struct.Struct(">I")
+
+
+def _encode(snapshot):
+    timestamp, usd_krw_rate, market_data = snapshot
+    payload = json.dumps({"t": timestamp.isoformat(), "r": usd_krw_rate, "d": market_data}, separators=(",", ":"))
+    data = payload.encode()
+    return _LENGTH.pack(len(data)) + data
+
+
+def _decode(data):
+    record = json.loads(data)
+    return datetime.fromisoformat(record["t"]), record["r"], record["d"]
+
+
+class Spool:
+    def __init__(self, path=SPOOL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._repaired = False
+
+    def size_bytes(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def pending(self):
+        return self.size_bytes() > 0
+
+    def _complete_length(self, content):
+        """Length of the prefix of content made of complete records"""
+        offset = 0
+        while offset + _LENGTH.size <= len(content):
+            (length,) = _LENGTH.unpack_from(content, offset)
+            if offset + _LENGTH.size + length > len(content):
+                break
+            offset += _LENGTH.size + length
+        return offset
+
+    def _repair(self):
+        """Cut off a record left half-written by a crash; call with the lock held"""
+        try:
+            with open(self.path, "r+b") as f:
+                content = f.read()
+                complete = self._complete_length(content)
+                if complete < len(content):
+                    logger.warning(f"Truncating {len(content) - complete} bytes of a partial record in {self.path}")
+                    f.truncate(complete)
+        except FileNotFoundError:
+            pass
+        self._repaired = True
+
+    def append(self, snapshots):
+        """Durably append snapshots (list of (timestamp, usd_krw_rate, market_data))"""
+        data = b"".join(_encode(snapshot) for snapshot in snapshots)
+        with self._lock:
+            if not self._repaired:
+                self._repair()
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "ab") as f:
+                size = f.tell()
+                try:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                except OSError:
+                    # e.g. disk full: do not leave a partial record behind
+                    f.truncate(size)
+                    raise
+
+    def read(self):
+        """All complete records, oldest first"""
+        with self._lock:
+            try:
+                with open(self.path, "rb") as f:
+                    content = f.read()
+            except FileNotFoundError:
+                return []
+        snapshots = []
+        offset = 0
+        complete = self._complete_length(content)
+        if complete < len(content):
+            logger.warning(f"Ignoring truncated record at the end of {self.path}")
+        while offset < complete:
+            (length,) = _LENGTH.unpack_from(content, offset)
+            end = offset + _LENGTH.size + length
+            try:
+                snapshots.append(_decode(content[offset + _LENGTH.size:end]))
+            except (ValueError, KeyError) as e:
+                logger.error(f"Skipping unreadable spool record at offset {offset}: {e}")
+            offset = end
+        return snapshots
+
+    def oldest_timestamp(self):
+        """Timestamp of the first complete record (the oldest snapshot not yet in the database), or None"""
+        with self._lock:
+            try:
+                with open(self.path, "rb") as f:
+                    head = f.read(_LENGTH.size)
+                    if len(head) < _LENGTH.size:
+                        return None
+                    (length,) = _LENGTH.unpack(head)
+                    data = f.read(length)
+            except FileNotFoundError:
+                return None
+        if len(data) < length:
+            return None
+        try:
+            return _decode(data)[0]
+        except (ValueError, KeyError) as e:
+            logger.error(f"Unreadable first spool record in {self.path}: {e}")
+            return None
+
+    def clear(self):
+        with self._lock:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self._repaired = True
+
+
+spool = Spool()
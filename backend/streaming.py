@@ -0,0 +1,168 @@
+"""
+WebSocket streaming market-data ingestion.
+
+Subscribes to the Bithumb, Binance and Korbit ticker streams on the ingestion
+event loop and merges every message into market_state, so the last-price table
+is as fresh as the exchanges publish it. Enabled with MARKET_DATA_MODE=stream;
+the REST ingestion jobs in scheduler.py stay scheduled and take over for any
+exchange whose stream has gone quiet.
+
+For offline tests and benchmarks, point the streams at the local replay server
+(scripts/ws_replay_server.py) with e.g. BINANCE_WS_URL=ws://localhost:8765/binance.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+
+import websockets
+
+from market_state import market_state
+
+logger = logging.getLogger(__name__)
+
+MARKET_DATA_MODE = os.getenv("MARKET_DATA_MODE", "rest").lower()
+
+# A stream counts as live if it delivered a message within this many seconds
+STREAM_LIVE_SECONDS = 10
+
+# How often the subscribed symbol set is compared with the tracked coins
+SYMBOL_CHECK_SECONDS = 60
+
+RECONNECT_MIN_DELAY = 1
+RECONNECT_MAX_DELAY = 30
+
+
+def _bithumb_subscribe(symbols):
+    return [{"type": "ticker", "symbols": [f"{s}_KRW" for s in symbols], "tickTypes": ["MID"]}]
+
+
+def _bithumb_parse(message, symbols):
+    if message.get("type") != "ticker":
+        return {}
+    content = message.get("content", {})
+    symbol = content.get("symbol", "").split("_")[0]
+    if symbol in symbols and content.get("closePrice"):
+        return {symbol: float(content["closePrice"])}
+    return {}
+
+
+def _binance_subscribe(symbols):
+    # !miniTicker@arr pushes every market once a second, no subscription needed
+    return []
+
+
+def _binance_parse(message, symbols):
+    items = message if isinstance(message, list) else [message]
+    prices = {}
+    for item in items:
+        pair = item.get("s", "")
+        if pair.endswith("USDT") and pair[:-4] in symbols and item.get("c"):
+            prices[pair[:-4]] = float(item["c"])
+    return prices
+
+
+def _korbit_subscribe(symbols):
+    return [[{"method": "subscribe", "type": "ticker", "symbols": [f"{s.lower()}_krw" for s in symbols]}]]
+
+
+def _korbit_parse(message, symbols):
+    if message.get("type") != "ticker":
+        return {}
+    symbol = message.get("symbol", "").split("_")[0].upper()
+    data = message.get("data", {})
+    if symbol in symbols and data.get("close"):
+        return {symbol: float(data["close"])}
+    return {}
+
+
+STREAMS = {
+    "bithumb": {
+        "url": os.getenv("BITHUMB_WS_URL", "wss://pubwss.bithumb.com/pub/ws"),
+        "subscribe": _bithumb_subscribe,
+        "parse": _bithumb_parse,
+    },
+    "binance": {
+        "url": os.getenv("BINANCE_WS_URL", "wss://stream.binance.com:9443/ws/!miniTicker@arr"),
+        "subscribe": _binance_subscribe,
+        "parse": _binance_parse,
+    },
+    "korbit": {
+        "url": os.getenv("KORBIT_WS_URL", "wss://ws-api.korbit.co.kr/v2/public"),
+        "subscribe": _korbit_subscribe,
+        "parse": _korbit_parse,
+    },
+}
+
+
+class StreamManager:
+    """Runs one reconnecting WebSocket consumer per exchange on the ingestion loop"""
+
+    def __init__(self):
+        self._tasks = {}
+        self._last_message = {}
+        self.message_counts = {name: 0 for name in STREAMS}
+
+    def is_live(self, name):
+        last = self._last_message.get(name)
+        return last is not None and time.monotonic() - last < STREAM_LIVE_SECONDS
+
+    async def _consume(self, name, symbols_provider):
+        spec = STREAMS[name]
+        delay = RECONNECT_MIN_DELAY
+        loop = asyncio.get_running_loop()
+        while True:
+            # symbols_provider may block on the coin list refresh, keep it off the loop
+            symbols = set(await loop.run_in_executor(None, symbols_provider))
+            try:
+                async with websockets.connect(spec["url"], ping_interval=20, max_size=2 ** 22) as ws:
+                    for payload in spec["subscribe"](sorted(symbols)):
+                        await ws.send(json.dumps(payload))
+                    logger.info(f"{name} stream connected ({len(symbols)} symbols)")
+                    delay = RECONNECT_MIN_DELAY
+                    checked_at = time.monotonic()
+
+                    async for raw in ws:
+                        self._last_message[name] = time.monotonic()
+                        self.message_counts[name] += 1
+                        try:
+                            prices = spec["parse"](json.loads(raw), symbols)
+                        except (ValueError, TypeError, AttributeError) as e:
+                            logger.debug(f"Unparseable {name} stream message: {e}")
+                            continue
+                        if prices:
+                            market_state.merge_prices(name, prices)
+
+                        # Resubscribe when the tracked coin list changes
+                        if time.monotonic() - checked_at > SYMBOL_CHECK_SECONDS:
+                            checked_at = time.monotonic()
+                            if set(await loop.run_in_executor(None, symbols_provider)) != symbols:
+                                logger.info(f"Tracked coins changed, resubscribing {name} stream")
+                                break
+                    else:
+                        logger.warning(f"{name} stream closed by server; reconnecting in {delay}s")
+                        await asyncio.sleep(delay)
+                        delay = min(delay * 2, RECONNECT_MAX_DELAY)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"{name} stream error: {e}; reconnecting in {delay}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    def start(self, loop, symbols_provider):
+        """Start all stream consumers on loop; symbols_provider() returns the tracked symbols"""
+        for name in STREAMS:
+            if name not in self._tasks:
+                self._tasks[name] = asyncio.run_coroutine_threadsafe(self._consume(name, symbols_provider), loop)
+        logger.info(f"Streaming ingestion started for {', '.join(STREAMS)}")
+
+    def stop(self):
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks = {}
+
+
+stream_manager = StreamManager()
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# Backend modules are imported flat, as the app and scripts do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep test runs away from the local database and data directory
+_data_dir = tempfile.mkdtemp(prefix="coin-trader-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_data_dir, 'test.db')}")
+os.environ.setdefault("DATA_DIR", _data_dir)
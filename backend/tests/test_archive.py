@@ -0,0 +1,67 @@
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func
+
+import archive
+import schema_migrations
+import tick_store
+from models import SessionLocal, PriceTick
+from spool import Spool
+
+DAY = datetime(2026, 3, 1)
+
+
+def _snapshot(timestamp, price):
+    return (timestamp, 1300.0, {"XRP": {"korbit": price}})
+
+
+def _write(snapshots):
+    db = SessionLocal()
+    try:
+        tick_store.write_snapshots(db, snapshots)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_day_with_spooled_ticks_is_archived_only_after_replay(tmp_path, monkeypatch):
+    schema_migrations.upgrade()
+    spool = Spool(str(tmp_path / "ticks.spool"))
+    monkeypatch.setattr(archive, "spool", spool)
+    monkeypatch.setattr(archive, "ARCHIVE_AVAILABLE", True)
+
+    archived = {}
+
+    def fake_archive_day(day, archive_dir=None):
+        # Stands in for the Parquet writer (pyarrow is optional): records what the file would hold
+        db = SessionLocal()
+        try:
+            count = db.execute(select(func.count()).select_from(PriceTick).where(
+                PriceTick.symbol == "XRP", PriceTick.timestamp >= day, PriceTick.timestamp < day + timedelta(days=1),
+            )).scalar()
+        finally:
+            db.close()
+        path = archive.day_path(day, archive_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "w").close()
+        archived[day] = count
+        return count
+
+    monkeypatch.setattr(archive, "archive_day", fake_archive_day)
+
+    _write([_snapshot(DAY + timedelta(hours=12), 1.0)])
+    # The database failed for the last batch of the day: it waits in the spool
+    late = _snapshot(DAY + timedelta(hours=23, minutes=59), 2.0)
+    spool.append([late])
+
+    archive.archive_closed_days(str(tmp_path))
+    assert DAY not in archived
+    assert archive.archived_cutoff(DAY + timedelta(days=2), str(tmp_path)) <= DAY
+
+    # Replay once the database is back, as the tick writer does
+    _write(spool.read())
+    spool.clear()
+
+    archive.archive_closed_days(str(tmp_path))
+    assert archived[DAY] == 2
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+import schema_migrations
+import tick_store
+from models import SessionLocal
+
+
+def _client():
+    schema_migrations.upgrade()
+    import main
+    return TestClient(main.app)
+
+
+def test_candles_validate_exchange_and_point_budget():
+    client = _client()
+    day = {"start": "2026-04-01T00:00:00", "end": "2026-04-02T00:00:00"}
+
+    assert client.get("/api/market/candles", params={**day, "exchange": "nowhere"}).status_code == 400
+    # A day of raw ticks (17280) or 1m candles (1440) exceeds the budget; 1h (24) fits
+    assert client.get("/api/market/candles", params={**day, "resolution": "raw", "max_points": 10**9}).status_code == 400
+    assert client.get("/api/market/candles", params={**day, "resolution": "1m", "max_points": 100}).status_code == 400
+    response = client.get("/api/market/candles", params={**day, "resolution": "1h", "max_points": 100})
+    assert response.status_code == 200
+    assert response.json()["resolution"] == "1h"
+
+
+def _write(prices):
+    db = SessionLocal()
+    try:
+        tick_store.write_snapshots(db, [(ts, 1300.0, {"ETH": {"korbit": price}}) for ts, price in prices])
+        db.commit()
+    finally:
+        db.close()
+
+
+def _ms(timestamp):
+    return int(timestamp.timestamp() * 1000)
+
+
+def test_since_ts_delta_keeps_resolution_and_resends_open_candle():
+    client = _client()
+    start = datetime(2026, 5, 1, 10, 0)
+    _write([(start + timedelta(seconds=5 * i), 100.0 + i) for i in range(31)])  # 10:00:00 .. 10:02:30
+    params = {"symbols": "ETH", "exchanges": "korbit", "end": (start + timedelta(minutes=10)).isoformat()}
+
+    full = client.get("/api/market/history", params={**params, "start": start.isoformat(), "resolution": "1m"}).json()
+    assert full["resolution"] == "1m"
+    assert full["series"][0]["t"] == [_ms(start + timedelta(minutes=m)) for m in range(3)]
+    assert full["series"][0]["p"][-1] == 130.0
+
+    _write([(start + timedelta(seconds=165), 150.0)])  # 10:02:45, still in the open 10:02 candle
+    assert client.get("/api/market/history", params={**params, "since_ts": full["series"][0]["t"][-1]}).status_code == 400
+
+    delta = client.get("/api/market/history", params={**params, "since_ts": full["series"][0]["t"][-1], "resolution": "1m"}).json()
+    assert delta["resolution"] == "1m"
+    assert delta["series"][0]["t"] == [_ms(start + timedelta(minutes=2))]
+    assert delta["series"][0]["p"] == [150.0]
+
+    raw = client.get("/api/market/history", params={**params, "since_ts": _ms(start + timedelta(seconds=150)), "resolution": "raw"}).json()
+    assert raw["series"][0]["t"] == [_ms(start + timedelta(seconds=165))]
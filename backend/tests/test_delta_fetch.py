@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+import schema_migrations
+import tick_store
+from models import SessionLocal, TradeLog
+
+
+def _chain(client, url, start_id):
+    """Follow X-Latest-Id until a page comes back empty; all ids received, in order"""
+    received, since_id = [], start_id
+    while True:
+        response = client.get(url, params={"since_id": since_id})
+        rows = response.json()
+        if not rows:
+            return received
+        received += [row["id"] for row in rows]
+        since_id = int(response.headers["X-Latest-Id"])
+
+
+def test_chained_deltas_return_every_row_once():
+    schema_migrations.upgrade()
+    import main
+
+    db = SessionLocal()
+    try:
+        trade_start = db.query(TradeLog).count()
+        db.add_all(TradeLog(exchange="bithumb", side="bid", price=1.0, amount_krw=1.0) for _ in range(120))
+        start = datetime(2026, 4, 1)
+        log_start = tick_store.latest_id(db) or 0
+        tick_store.write_snapshots(db, [
+            (start + timedelta(seconds=i), 1300.0, {"BTC": {"bithumb": 100.0 + i}}) for i in range(250)
+        ])
+        db.commit()
+        trade_ids = [trade.id for trade in db.query(TradeLog).order_by(TradeLog.id)][trade_start:]
+    finally:
+        db.close()
+
+    client = TestClient(main.app)
+    assert _chain(client, "/api/trades", trade_ids[0] - 1) == trade_ids
+    assert _chain(client, "/api/market/history", log_start) == list(range(log_start + 1, log_start + 251))
@@ -0,0 +1,32 @@
+import scheduler
+import ingestion
+from market_state import market_state
+from resilience import CircuitOpenError
+
+
+def test_open_bithumb_breaker_keeps_previous_prices(monkeypatch):
+    calls = []
+
+    async def circuit_open(exchange, method, url, **kwargs):
+        calls.append(url)
+        raise CircuitOpenError(f"{exchange} circuit open")
+
+    monkeypatch.setattr(ingestion, "async_request", circuit_open)
+    monkeypatch.setattr(scheduler, "get_tracked_symbols", lambda: ["BTC", "ETH"])
+    market_state.update_prices("bithumb", {"BTC": 100.0, "ETH": 5.0})
+    updated_at = market_state.updated_at("bithumb")
+
+    scheduler.ingest_exchange("bithumb")
+
+    assert calls == ["/public/ticker/ALL_KRW"]  # No per-symbol fallback while open
+    assert market_state.latest_price("bithumb", "BTC") == 100.0
+    assert market_state.latest_price("bithumb", "ETH") == 5.0
+    assert market_state.updated_at("bithumb") == updated_at
+
+
+def test_bithumb_fallback_failing_everywhere_returns_none(monkeypatch):
+    async def failing(exchange, method, url, **kwargs):
+        raise ConnectionError("unreachable")
+
+    monkeypatch.setattr(ingestion, "async_request", failing)
+    assert ingestion.engine.run(lambda: ingestion.fetch_bithumb_prices(["BTC", "ETH"])) is None
@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+import scheduler
+from market_state import market_state
+from price_snapshot import price_snapshot
+
+
+def test_persist_stage_publishes_before_the_database_write(monkeypatch):
+    submitted = []
+    monkeypatch.setattr(scheduler, "get_tracked_symbols", lambda: ["BTC"])
+    # The database is down: nothing the writer receives gets committed
+    monkeypatch.setattr(scheduler.tick_writer, "submit", lambda *snapshot: submitted.append(snapshot))
+    market_state.update_prices("bithumb", {"BTC": 123.0})
+    version = price_snapshot.version()
+
+    scheduler.persist_market_data()
+
+    published = price_snapshot.published()
+    assert submitted and published.snapshot["timestamp"] == submitted[0][0]
+    assert published.snapshot["id"] is None
+    assert published.snapshot["btc_price"] == 123.0
+    assert json.loads(published.prices_body)["btc_price"] == 123.0
+    assert price_snapshot.version() != version
+
+
+def test_published_snapshot_is_read_only_at_every_level(monkeypatch):
+    monkeypatch.setattr(scheduler, "get_tracked_symbols", lambda: ["BTC"])
+    monkeypatch.setattr(scheduler.tick_writer, "submit", lambda *snapshot: None)
+    market_state.update_prices("bithumb", {"BTC": 1.0})
+    scheduler.persist_market_data()
+    snapshot = price_snapshot.published().snapshot
+    with pytest.raises(TypeError):
+        snapshot["market_data"]["BTC"]["bithumb"] = 0.0
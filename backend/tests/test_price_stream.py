@@ -0,0 +1,68 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import schema_migrations
+import price_stream
+import tick_writer as tick_writer_module
+
+BATCH = tick_writer_module.STREAM_MAX_TICKS + 1  # Spool-replay sized
+
+
+def _snapshots(count, start):
+    return [(start + timedelta(seconds=i), 1300.0, {"BTC": {"bithumb": 100.0 + i}}) for i in range(count)]
+
+
+def _parse(message):
+    fields = dict(line.split(": ", 1) for line in message.decode().strip().split("\n"))
+    return fields.get("id"), fields["event"], json.loads(fields["data"])
+
+
+def _drain(subscriber):
+    messages = []
+    while not subscriber.queue.empty():
+        messages.append(_parse(subscriber.queue.get_nowait()))
+    return messages
+
+
+def test_every_stored_snapshot_is_streamed_in_id_order(monkeypatch):
+    schema_migrations.upgrade()
+
+    async def run():
+        broker = price_stream.StreamBroker()
+        monkeypatch.setattr(tick_writer_module, "broker", broker)
+        subscriber = broker.subscribe()
+        writer = tick_writer_module.TickWriter()
+        start = datetime(2026, 3, 1, 0, 0, 0)
+        await asyncio.to_thread(writer._write, _snapshots(3, start))
+        await asyncio.to_thread(writer._write, _snapshots(BATCH, start + timedelta(minutes=1)))
+        await asyncio.sleep(0)  # Run the queued fan-outs
+        return _drain(subscriber)
+
+    messages = asyncio.run(run())
+    ticks, backfill = messages[:3], messages[3]
+    assert [event for _, event, _ in ticks] == ["tick"] * 3
+    ids = [int(event_id) for event_id, _, _ in ticks]
+    assert ids == sorted(ids) and [data["id"] for _, _, data in ticks] == ids
+    assert [data["btc_price"] for _, _, data in ticks] == [100.0, 101.0, 102.0]
+    assert backfill[1] == "backfill"
+    assert backfill[2] == {"first_id": ids[-1] + 1, "last_id": ids[-1] + BATCH, "count": BATCH}
+    assert len(messages) == 4
+
+
+def test_events_published_after_subscribe_reach_the_client():
+    async def run():
+        broker = price_stream.StreamBroker()
+        subscriber = broker.subscribe()
+        # Published before the response starts iterating the stream
+        broker.publish("price", b'{"btc_price":1}')
+        await asyncio.sleep(0)
+        stream = broker.events(subscriber, [price_stream.frame("price", b'{"btc_price":0}')])
+        received = [await stream.__anext__() for _ in range(3)]
+        await stream.aclose()
+        return received
+
+    retry, initial, published = asyncio.run(run())
+    assert retry.startswith(b"retry:")
+    assert _parse(initial)[2] == {"btc_price": 0}
+    assert _parse(published)[2] == {"btc_price": 1}
@@ -0,0 +1,55 @@
+import os
+from datetime import datetime
+
+import schema_migrations
+import tick_store
+import tick_writer as tick_writer_module
+from models import SessionLocal, PriceLog
+from spool import Spool
+
+
+def _snapshot(second, price):
+    return (datetime(2026, 2, 1, 9, 0, second), 1300.0, {"BTC": {"bithumb": price, "bithumb_krw": price}})
+
+
+def _truncate_last_record(path, cut=5):
+    size = os.path.getsize(path)
+    with open(path, "r+b") as f:
+        f.truncate(size - cut)
+
+
+def test_truncated_tail_is_ignored_and_cut_before_next_append(tmp_path):
+    path = str(tmp_path / "spool" / "ticks.spool")
+    Spool(path).append([_snapshot(0, 100.0), _snapshot(1, 101.0), _snapshot(2, 102.0)])
+    _truncate_last_record(path)  # Crash in the middle of the third record
+
+    restarted = Spool(path)
+    assert restarted.read() == [_snapshot(0, 100.0), _snapshot(1, 101.0)]
+
+    restarted.append([_snapshot(3, 103.0)])
+    assert restarted.read() == [_snapshot(0, 100.0), _snapshot(1, 101.0), _snapshot(3, 103.0)]
+
+
+def test_replay_writes_complete_records_once_and_clears_spool(tmp_path, monkeypatch):
+    schema_migrations.upgrade()
+    spool = Spool(str(tmp_path / "ticks.spool"))
+    spool.append([_snapshot(10, 110.0), _snapshot(11, 111.0), _snapshot(12, 112.0)])
+    _truncate_last_record(spool.path)
+    monkeypatch.setattr(tick_writer_module, "spool", spool)
+
+    writer = tick_writer_module.TickWriter()
+    writer._replay_spool()
+    # A second replay of the same records (e.g. after a crash before clear) writes nothing new
+    spool.append([_snapshot(10, 110.0), _snapshot(11, 111.0)])
+    writer._replay_spool()
+
+    assert not spool.pending()
+    db = SessionLocal()
+    try:
+        logs = db.query(PriceLog).filter(PriceLog.timestamp.between(_snapshot(10, 0)[0], _snapshot(12, 0)[0]))
+        stored = sorted(log.timestamp for log in logs)
+        [latest] = tick_store.history(db, limit=1)
+    finally:
+        db.close()
+    assert stored == [_snapshot(10, 0)[0], _snapshot(11, 0)[0]]
+    assert latest["btc_price"] == 111.0
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+import schema_migrations
+import tick_store
+from listings import symbol_listings
+from market_state import market_state
+from models import SessionLocal
+
+
+def _market_data():
+    market_state.update_prices("bithumb", {"BTC": 100.0})
+    market_state.update_prices("binance", {})
+    market_state.update_prices("korbit", {})
+    # ETH has no price anywhere, XRP is not listed on Korbit
+    return market_state.snapshot(["BTC", "ETH", "XRP"], unlisted={"korbit": {"XRP"}})
+
+
+def test_history_matches_written_snapshot_across_listing_refresh():
+    schema_migrations.upgrade()
+    snapshot = (datetime(2026, 1, 1, 12, 0, 0), 1300.0, _market_data())
+    db = SessionLocal()
+    try:
+        [(log_id, written)] = tick_store.write_snapshots(db, [snapshot])
+        db.commit()
+        expected = tick_store.snapshot_to_legacy(written, log_id)
+
+        # Listing refreshes after the write must not change stored responses
+        symbol_listings.update("korbit", {"BTC", "ETH"})
+        symbol_listings.update("binance", {"BTC"})
+        [stored] = tick_store.history(db, limit=1)
+    finally:
+        db.close()
+
+    assert stored == expected
+    market_data = stored["market_data"]
+    assert list(market_data) == ["BTC", "ETH", "XRP"]
+    assert market_data["ETH"]["bithumb"] == 0.0
+    assert market_data["ETH"]["binance"] == 0.0
+    assert market_data["XRP"]["korbit"] is None
+    assert market_data["XRP"]["korbit_krw"] is None
@@ -0,0 +1,256 @@
+"""
+Normalized price tick store.
+
+Each persisted snapshot is a PriceLog header row (id, timestamp, usd_krw_rate)
+plus one price_ticks row per (symbol, exchange) with a price. Reads go through
+this module, which rebuilds the legacy response shape (wide *_price/*_binance/
+*_korbit fields plus market_data) so /api/prices and /api/market/history keep
+their format. Rows written before price_ticks existed have no ticks and are
+served from their stored wide columns / market_data blob instead.
+"""
+
+import csv
+import io
+import logging
+
+from sqlalchemy import func, insert, select
+
+from models import PriceLog, PriceTick
+from market_state import EXCHANGES, EXCHANGE_KEYS
+import rollups
+
+logger = logging.getLogger(__name__)
+
+# Legacy wide columns per exchange: coin -> PriceLog attribute
+LEGACY_COLUMNS = {
+    "bithumb": {"BTC": "btc_price", "ETH": "eth_price", "XRP": "xrp_price",
+                "SOL": "sol_price", "USDT": "usdt_price", "DOGE": "doge_price"},
+    "binance": {"BTC": "btc_binance", "ETH": "eth_binance", "XRP": "xrp_binance",
+                "SOL": "sol_binance", "DOGE": "doge_binance"},
+    "korbit": {"BTC": "btc_korbit", "ETH": "eth_korbit", "XRP": "xrp_korbit",
+               "SOL": "sol_korbit", "DOGE": "doge_korbit"},
+}
+
+
+def tick_rows(timestamp, market_data):
+    """price_ticks rows for one snapshot; stale (0.0) and unlisted (None) prices are not stored"""
+    rows = []
+    for symbol, entry in market_data.items():
+        for exchange in EXCHANGES:
+            price = entry.get(exchange)
+            if price:
+                rows.append({"symbol": symbol, "exchange": exchange, "timestamp": timestamp, "price": price})
+    return rows
+
+
+def snapshot_layout(market_data):
+    """
+    What the stored ticks cannot tell: every tracked symbol (in order) and the
+    ones each exchange did not list when the snapshot was taken. Stored with
+    the header so reads rebuild market_data exactly as it was written.
+    """
+    unlisted = {}
+    for symbol, entry in market_data.items():
+        for exchange in EXCHANGES:
+            if entry.get(exchange, 0.0) is None:
+                unlisted.setdefault(exchange, []).append(symbol)
+    return {"symbols": list(market_data), "unlisted": unlisted}
+
+
+def _copy_ticks(db, rows):
+    """Bulk-load tick rows with PostgreSQL COPY inside the session's transaction"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow((row["symbol"], row["exchange"], row["timestamp"].isoformat(), repr(row["price"])))
+    buffer.seek(0)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert("COPY price_ticks (symbol, exchange, timestamp, price) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+def insert_ticks(db, rows):
+    """COPY on PostgreSQL, one executemany elsewhere; the caller commits"""
+    if not rows:
+        return
+    if db.get_bind().dialect.name == "postgresql":
+        _copy_ticks(db, rows)
+    else:
+        db.execute(insert(PriceTick), rows)
+
+
+def stored_timestamps(db, start, end):
+    """Snapshot timestamps in [start, end] that already have ticks (ix_price_ticks_timestamp range scan)"""
+    return set(db.execute(
+        select(PriceTick.timestamp).where(PriceTick.timestamp.between(start, end)).distinct()
+    ).scalars())
+
+
+def write_snapshots(db, snapshots, skip_existing=False):
+    """
+    Write a batch of (timestamp, usd_krw_rate, market_data) snapshots: one
+    multi-row header INSERT, one bulk tick load and one candle upsert.
+    skip_existing drops snapshots whose timestamp is already stored (spool
+    replay). The caller commits. Returns [(header id, snapshot)] of the
+    snapshots written, in order.
+    """
+    if skip_existing and snapshots:
+        existing = stored_timestamps(db, min(s[0] for s in snapshots), max(s[0] for s in snapshots))
+        snapshots = [s for s in snapshots if s[0] not in existing]
+    if not snapshots:
+        return []
+    ids = db.execute(
+        insert(PriceLog).returning(PriceLog.id, sort_by_parameter_order=True),
+        [{"timestamp": timestamp, "usd_krw_rate": usd_krw_rate, "layout": snapshot_layout(market_data)}
+         for timestamp, usd_krw_rate, market_data in snapshots],
+    ).scalars().all()
+    rows = [row for timestamp, _, market_data in snapshots for row in tick_rows(timestamp, market_data)]
+    insert_ticks(db, rows)
+    rollups.update_candles(db, rows)
+    return list(zip(ids, snapshots))
+
+
+def _ticks_by_timestamp(db, timestamps):
+    """{timestamp: {symbol: {exchange: price}}} for the given snapshot timestamps"""
+    if not timestamps:
+        return {}
+    query = select(PriceTick.timestamp, PriceTick.symbol, PriceTick.exchange, PriceTick.price)
+    if len(timestamps) == 1:
+        query = query.where(PriceTick.timestamp == timestamps[0])
+    else:
+        # One range scan on ix_price_ticks_timestamp instead of a large IN list
+        query = query.where(PriceTick.timestamp.between(min(timestamps), max(timestamps)))
+    wanted = set(timestamps)
+    result = {}
+    for timestamp, symbol, exchange, price in db.execute(query):
+        if timestamp in wanted:
+            result.setdefault(timestamp, {}).setdefault(symbol, {})[exchange] = price
+    return result
+
+
+def _market_data_from_ticks(prices, layout=None):
+    if layout:
+        symbols = layout["symbols"]
+        unlisted = {name: set(layout["unlisted"].get(name, ())) for name in EXCHANGES}
+    else:
+        # Written before layouts were stored: only symbols with ticks, nothing known to be unlisted
+        symbols = list(prices)
+        unlisted = {name: set() for name in EXCHANGES}
+    market_data = {}
+    for symbol in symbols:
+        by_exchange = prices.get(symbol, {})
+        entry = {}
+        for name in EXCHANGES:
+            # Missing means stale (0.0) unless the exchange did not list the symbol (None)
+            price = by_exchange.get(name, None if symbol in unlisted[name] else 0.0)
+            for key in EXCHANGE_KEYS[name]:
+                entry[key] = price
+        market_data[symbol] = entry
+    return market_data
+
+
+def _legacy(log_id, timestamp, usd_krw_rate, columns, market_data):
+    return {
+        "id": log_id,
+        "timestamp": timestamp,
+        **columns,
+        "usd_krw_rate": usd_krw_rate,
+        "market_data": market_data,
+    }
+
+
+def _legacy_from_prices(log_id, timestamp, usd_krw_rate, prices, layout=None):
+    market_data = _market_data_from_ticks(prices, layout)
+    columns = {
+        column: market_data.get(coin, {}).get(exchange) or 0.0
+        for exchange, coins in LEGACY_COLUMNS.items()
+        for coin, column in coins.items()
+    }
+    return _legacy(log_id, timestamp, usd_krw_rate, columns, market_data)
+
+
+def to_legacy(log, prices=None):
+    """PriceLog header (+ its ticks) in the legacy response shape"""
+    if prices or log.layout:
+        return _legacy_from_prices(log.id, log.timestamp, log.usd_krw_rate, prices or {}, log.layout)
+    # Row written before price_ticks existed
+    columns = {
+        column: getattr(log, column)
+        for coins in LEGACY_COLUMNS.values()
+        for column in coins.values()
+    }
+    return _legacy(log.id, log.timestamp, log.usd_krw_rate, columns, log.market_data or {})
+
+
+def snapshot_to_legacy(snapshot, log_id=None):
+    """A (timestamp, usd_krw_rate, market_data) snapshot in the legacy shape; log_id is None until it is stored"""
+    timestamp, usd_krw_rate, market_data = snapshot
+    prices = {}
+    for row in tick_rows(timestamp, market_data):
+        prices.setdefault(row["symbol"], {})[row["exchange"]] = row["price"]
+    return _legacy_from_prices(log_id, timestamp, usd_krw_rate, prices, snapshot_layout(market_data))
+
+
+def legacy_market_data(log):
+    """market_data of a row written before price_ticks existed (rebuilt from the wide columns if it has no blob)"""
+    if log.market_data:
+        return log.market_data
+    market_data = {}
+    for exchange, coins in LEGACY_COLUMNS.items():
+        for coin, column in coins.items():
+            market_data.setdefault(coin, {})[exchange] = getattr(log, column)
+    return market_data
+
+
+def latest_snapshot(db):
+    """Latest snapshot in the legacy shape, or None"""
+    # Primary key ordering avoids issues when the system clock drifts
+    log = db.query(PriceLog).order_by(PriceLog.id.desc()).first()
+    if not log:
+        return None
+    return to_legacy(log, _ticks_by_timestamp(db, [log.timestamp]).get(log.timestamp))
+
+
+def latest_id(db):
+    """Id of the newest PriceLog row, or None"""
+    return db.execute(select(func.max(PriceLog.id))).scalar()
+
+
+def history(db, limit=100, since_id=None):
+    """
+    Last limit snapshots in the legacy shape, oldest first. With since_id the
+    first limit snapshots with a larger id instead, so chaining on the last id
+    returned never skips any.
+    """
+    if since_id is None:
+        logs = db.query(PriceLog).order_by(PriceLog.id.desc()).limit(limit).all()[::-1]
+    else:
+        logs = db.query(PriceLog).filter(PriceLog.id > since_id).order_by(PriceLog.id).limit(limit).all()
+    ticks = _ticks_by_timestamp(db, [log.timestamp for log in logs])
+    return [to_legacy(log, ticks.get(log.timestamp)) for log in logs]
+
+
+def snapshot_price(snapshot, exchange, symbol):
+    """Price of symbol on exchange in a legacy-shaped snapshot (None if unknown)"""
+    if not snapshot:
+        return None
+    symbol = symbol.upper()
+    price = (snapshot["market_data"].get(symbol) or {}).get(exchange)
+    if price is None and symbol in LEGACY_COLUMNS.get(exchange, {}):
+        # Oldest rows only have the wide columns
+        price = snapshot[LEGACY_COLUMNS[exchange][symbol]]
+    return price
+
+
+def price_range(db, symbol, exchange, start=None, end=None):
+    """[(timestamp, price)] of one symbol on one exchange, oldest first (primary-key range scan)"""
+    query = select(PriceTick.timestamp, PriceTick.price).where(
+        PriceTick.symbol == symbol.upper(), PriceTick.exchange == exchange
+    )
+    if start is not None:
+        query = query.where(PriceTick.timestamp >= start)
+    if end is not None:
+        query = query.where(PriceTick.timestamp <= end)
+    return [tuple(row) for row in db.execute(query.order_by(PriceTick.timestamp))]
@@ -0,0 +1,187 @@
+"""
+Buffered, batched write path for market snapshots.
+
+The persist stage only enqueues snapshots; a single writer thread drains the
+queue and flushes whenever FLUSH_MAX_SNAPSHOTS are buffered or the oldest
+buffered snapshot is FLUSH_INTERVAL_SECONDS old. A flush is one transaction:
+a multi-row header INSERT, COPY (PostgreSQL) or executemany (SQLite) for the
+ticks, and one candle upsert (see tick_store.write_snapshots). Flush latency,
+batch size and queue depth are exported as metrics. After each commit the
+newest snapshot is republished to the in-memory price_snapshot with its id,
+and every stored snapshot is pushed to stream clients in id order (a batch
+larger than STREAM_MAX_TICKS, e.g. a spool replay, as one backfill range so
+slow clients are not dropped).
+
+Batches that fail to write go to the durable spool (spool.py). While the
+spool holds data, new batches are appended behind it so order is kept, and
+the writer replays the spool in bulk every REPLAY_RETRY_SECONDS until the
+database accepts it again.
+"""
+
+import queue
+import threading
+import time
+import logging
+
+from models import WriteSession
+from spool import spool
+from price_snapshot import price_snapshot
+import price_stream
+from price_stream import broker
+import tick_store
+import metrics
+
+logger = logging.getLogger(__name__)
+
+FLUSH_MAX_SNAPSHOTS = 50      # Flush as soon as this many snapshots are buffered
+FLUSH_INTERVAL_SECONDS = 2.0  # ...or when the oldest buffered snapshot is this old
+MAX_QUEUE_SNAPSHOTS = 10000   # Bound on memory if the writer falls behind
+
+REPLAY_RETRY_SECONDS = 5       # Pause between spool replay attempts while the database is failing
+REPLAY_BATCH_SNAPSHOTS = 500   # Snapshots per transaction during replay
+
+STREAM_MAX_TICKS = 16          # Larger batches go to stream clients as a backfill range (< their queue size)
+
+
+class TickWriter:
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=MAX_QUEUE_SNAPSHOTS)
+        self._thread = None
+        self._stopping = threading.Event()
+        self._last_failure = 0.0
+        metrics.TICK_WRITER_QUEUE_DEPTH.set_function(self._queue.qsize)
+        metrics.SPOOL_BYTES.set_function(spool.size_bytes)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="tick-writer", daemon=True)
+        self._thread.start()
+        logger.info("Tick writer started")
+
+    def stop(self, timeout=10):
+        """Flush what is buffered and stop the writer thread"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def submit(self, timestamp, usd_krw_rate, market_data):
+        """Queue one snapshot for writing; never blocks"""
+        try:
+            self._queue.put_nowait((timestamp, usd_krw_rate, market_data))
+        except queue.Full:
+            metrics.TICK_WRITER_DROPPED.inc()
+            logger.error(f"Tick writer queue full ({MAX_QUEUE_SNAPSHOTS}); dropped snapshot {timestamp}")
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            # Wake up at least twice a second to notice stop()
+            wait = 0.5 if deadline is None else max(0.0, min(0.5, deadline - time.monotonic()))
+            try:
+                batch.append(self._queue.get(timeout=wait))
+                if deadline is None:
+                    deadline = time.monotonic() + FLUSH_INTERVAL_SECONDS
+            except queue.Empty:
+                pass
+
+            stopping = self._stopping.is_set()
+            if stopping:
+                # Drain everything that is left before exiting
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+            if batch and (stopping or len(batch) >= FLUSH_MAX_SNAPSHOTS or time.monotonic() >= deadline):
+                self.flush(batch)
+                batch, deadline = [], None
+            elif not batch and spool.pending():
+                self._replay_spool()
+            if stopping:
+                return
+
+    def _write(self, snapshots, skip_existing=False):
+        """One transaction; raises on failure"""
+        start_time = time.perf_counter()
+        db = WriteSession()
+        try:
+            written = tick_store.write_snapshots(db, snapshots, skip_existing=skip_existing)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        elapsed = time.perf_counter() - start_time
+        metrics.DB_SAVE_SECONDS.observe(elapsed)
+        metrics.TICK_WRITER_BATCH_SNAPSHOTS.observe(len(snapshots))
+        logger.debug(f"Flushed {len(written)} snapshots in {elapsed:.3f}s")
+        if written:
+            log_id, snapshot = max(written, key=lambda item: item[1][0])
+            # The persist stage already published it; this adds its id
+            price_snapshot.publish(tick_store.snapshot_to_legacy(snapshot, log_id))
+            # Spool replays can write older snapshots under newer ids
+            price_snapshot.advance(max(log_id for log_id, _ in written))
+            self._stream(written)
+        return len(written)
+
+    def _stream(self, written):
+        """Every stored snapshot to stream clients, in id order; a large batch as one backfill range"""
+        if len(written) > STREAM_MAX_TICKS:
+            first_id, last_id = written[0][0], written[-1][0]
+            payload = {"first_id": first_id, "last_id": last_id, "count": len(written)}
+            broker.publish("backfill", price_stream.dumps(payload), last_id)
+            return
+        for log_id, snapshot in written:
+            broker.publish("tick", price_stream.dumps(tick_store.snapshot_to_legacy(snapshot, log_id)), log_id)
+
+    def flush(self, snapshots):
+        if spool.pending():
+            # Keep order: new snapshots wait behind the spooled ones
+            self._spool(snapshots)
+            self._replay_spool()
+            return
+        try:
+            self._write(snapshots)
+        except Exception as e:
+            logger.error(f"Writing {len(snapshots)} snapshots failed, spooling to {spool.path}: {e}")
+            self._last_failure = time.monotonic()
+            self._spool(snapshots)
+
+    def _spool(self, snapshots):
+        try:
+            spool.append(snapshots)
+            metrics.SPOOLED_SNAPSHOTS.inc(len(snapshots))
+        except OSError as e:
+            metrics.TICK_WRITER_DROPPED.inc(len(snapshots))
+            logger.error(f"Could not spool {len(snapshots)} snapshots, they are lost: {e}")
+
+    def _replay_spool(self):
+        """Write the whole spool in order (de-duplicated by timestamp), then clear it"""
+        if time.monotonic() - self._last_failure < REPLAY_RETRY_SECONDS:
+            return
+        snapshots = spool.read()
+        written = 0
+        try:
+            for i in range(0, len(snapshots), REPLAY_BATCH_SNAPSHOTS):
+                written += self._write(snapshots[i:i + REPLAY_BATCH_SNAPSHOTS], skip_existing=True)
+        except Exception as e:
+            # Batches already committed are skipped as duplicates on the next attempt
+            self._last_failure = time.monotonic()
+            logger.warning(f"Spool replay failed after {written} snapshots, retrying in {REPLAY_RETRY_SECONDS}s: {e}")
+            return
+        spool.clear()
+        metrics.REPLAYED_SNAPSHOTS.inc(written)
+        logger.info(f"Replayed {written} spooled snapshots ({len(snapshots) - written} already stored)")
+
+
+tick_writer = TickWriter()
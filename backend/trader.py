@@ -2,19 +2,15 @@ import time
 import hashlib
 import uuid
 import jwt
-import requests
-import urllib3
+import httpx
 import logging
 from urllib.parse import urlencode
 
-# Disable SSL warnings
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from exchange_client import request as exchange_request
 
 # Logging setup
 logger = logging.getLogger(__name__)
 
-BASE_URL = "https://api.bithumb.com"
-
 def generate_jwt_token(api_key, api_secret, params=None):
     if params:
         query = urlencode(params).encode()
@@ -39,7 +35,6 @@ def generate_jwt_token(api_key, api_secret, params=None):
     return 'Bearer {}'.format(jwt_token)
 
 def api_request(endpoint, params, api_key, api_secret, method="POST"):
-    url = f"{BASE_URL}{endpoint}"
     authorization_token = generate_jwt_token(api_key, api_secret, params)
     headers = {
         "Authorization": authorization_token,
@@ -50,9 +45,10 @@ def api_request(endpoint, params, api_key, api_secret, method="POST"):
         logger.info(f"Bithumb API Request: {method} {endpoint}, params={params}")
         
         if method == "POST":
-            response = requests.post(url, json=params, headers=headers, verify=False, timeout=10)
+            response = exchange_request("bithumb", "POST", endpoint, json=params, headers=headers)
         else:
-            response = requests.get(url, params=params, headers=headers, verify=False, timeout=10)
+            # Signed with a single-use nonce, so never hedged (idempotent=False)
+            response = exchange_request("bithumb", "GET", endpoint, idempotent=False, params=params, headers=headers)
         
         logger.info(f"Bithumb API Response Status: {response.status_code}")
         logger.info(f"Bithumb API Response Headers: {dict(response.headers)}")
@@ -76,10 +72,10 @@ def api_request(endpoint, params, api_key, api_secret, method="POST"):
             logger.error(f"Bithumb API JSON Parse Error: {e}, Response text: {response.text[:500]}")
             return {"status": "error", "message": f"Invalid JSON response: {str(e)}"}
             
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         logger.error(f"Bithumb API Timeout: {endpoint}")
         return {"status": "error", "message": "Request timeout"}
-    except requests.exceptions.ConnectionError as e:
+    except httpx.NetworkError as e:
         logger.error(f"Bithumb API Connection Error: {e}")
         return {"status": "error", "message": f"Connection error: {str(e)}"}
     except Exception as e:
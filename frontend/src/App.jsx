@@ -1,5 +1,5 @@
-import React, { useState, useEffect } from 'react';
-import { api } from './api';
+import React, { useState, useEffect, useRef } from 'react';
+import { api, subscribeMarketStream } from './api';
 import MultiCoinCharts from './components/MultiCoinCharts';
 import TradeForm from './components/TradeForm';
 import KeyManager from './components/KeyManager';
@@ -10,6 +10,38 @@ import ConfirmationModal from './components/ConfirmationModal';
 import PhoneSetupModal from './components/PhoneSetupModal';
 import { Activity, LogOut, Settings, User } from 'lucide-react';
 
+const HISTORY_LIMIT = 100; // Same as the /market/history default
+const TRADES_LIMIT = 50;   // Same as /trades
+
+// Rows newer than the last one held (history is oldest first)
+const appendNewer = (history, rows) => {
+  const last = history[history.length - 1];
+  const fresh = last ? rows.filter(row => row.id > last.id) : rows;
+  return fresh.length ? [...history, ...fresh].slice(-HISTORY_LIMIT) : history;
+};
+
+// Trades not held yet (trades are newest first)
+const prependNewer = (trades, rows) => {
+  const held = new Set(trades.map(trade => trade.id));
+  const fresh = rows.filter(trade => !held.has(trade.id));
+  return fresh.length ? [...fresh, ...trades].slice(0, TRADES_LIMIT) : trades;
+};
+
+const latestId = (res) => {
+  const id = res.headers['x-latest-id'];
+  return id ? Number(id) : null;
+};
+
+// Rows after the cursor; a full page means more are waiting, and only the
+// latest window is shown, so the latest window is loaded instead
+const fetchSince = async (get, sinceId, limit) => {
+  if (sinceId !== null) {
+    const res = await get({ since_id: sinceId });
+    if (res.data.length < limit) return { res, delta: true };
+  }
+  return { res: await get(), delta: false };
+};
+
 function App() {
   const [isAuthenticated, setIsAuthenticated] = useState(!!localStorage.getItem('token'));
   const [user, setUser] = useState(null);
@@ -19,27 +51,41 @@ function App() {
   const [marketHistory, setMarketHistory] = useState([]);
   const [trades, setTrades] = useState([]);
   const [keys, setKeys] = useState([]);
+  const [latestPrices, setLatestPrices] = useState(null);
   const [currentPrice, setCurrentPrice] = useState(null);
   const [exchangeRate, setExchangeRate] = useState(null);
   const [usdtPrice, setUsdtPrice] = useState(null);
   const [toast, setToast] = useState(null);
+  // Newest history/trade ids held, so a resync only fetches what was missed
+  const cursors = useRef({ history: null, trades: null });
 
   const showToast = (message, type = 'error') => {
     setToast({ message, type });
   };
 
+  const applySnapshot = (snapshot) => {
+    setLatestPrices(snapshot);
+    setCurrentPrice(snapshot.btc_price);
+    setExchangeRate(snapshot.usd_krw_rate);
+    setUsdtPrice(snapshot.usdt_price);
+  };
+
   const fetchData = async () => {
+    const { history: historyId, trades: tradeId } = cursors.current;
     try {
-      const [historyRes, tradesRes, currentRes] = await Promise.all([
-        api.getMarketHistory(),
-        api.getTrades(),
+      const [history, tradeLog, currentRes] = await Promise.all([
+        fetchSince(api.getMarketHistory, historyId, HISTORY_LIMIT),
+        fetchSince(api.getTrades, tradeId, TRADES_LIMIT),
         api.getMarketCurrent()
       ]);
-      setMarketHistory(historyRes.data);
-      setTrades(tradesRes.data);
-      setCurrentPrice(currentRes.data.btc_price);
-      setExchangeRate(currentRes.data.usd_krw_rate);
-      setUsdtPrice(currentRes.data.usdt_price);
+      setMarketHistory(previous => history.delta ? appendNewer(previous, history.res.data) : history.res.data);
+      // Deltas come oldest first
+      setTrades(previous => tradeLog.delta ? prependNewer(previous, [...tradeLog.res.data].reverse()) : tradeLog.res.data);
+      cursors.current = {
+        history: Math.max(cursors.current.history ?? 0, latestId(history.res) ?? 0) || null,
+        trades: Math.max(cursors.current.trades ?? 0, latestId(tradeLog.res) ?? 0) || null,
+      };
+      applySnapshot(currentRes.data);
     } catch (error) {
       console.error("Failed to fetch market data", error);
     }
@@ -64,8 +110,24 @@ function App() {
           setIsPhoneSetupOpen(true);
         }
       }).catch(console.error);
-      const interval = setInterval(fetchData, 5000); // Poll every 5 seconds
-      return () => clearInterval(interval);
+      // New ticks and trades are pushed; on (re)connect only what was missed is fetched
+      const stream = subscribeMarketStream({
+        onOpen: fetchData,
+        // Live prices, pushed before (and even without) being stored
+        onPrice: applySnapshot,
+        // Stored snapshots, in id order (spool replays can carry older timestamps)
+        onTick: (snapshot) => {
+          setMarketHistory(history => appendNewer(history, [snapshot]));
+          cursors.current.history = Math.max(cursors.current.history ?? 0, snapshot.id);
+        },
+        // Too many stored at once to push: fetch them after the cursor
+        onBackfill: fetchData,
+        onTrade: (trade) => {
+          setTrades(previous => prependNewer(previous, [trade]));
+          cursors.current.trades = Math.max(cursors.current.trades ?? 0, trade.id);
+        },
+      });
+      return () => stream.close();
     }
   }, [isAuthenticated]);
 
@@ -210,7 +272,7 @@ function App() {
 
         <div className="grid grid-cols-1 lg:grid-cols-2 gap-6">
           <KeyManager keys={keys} onUpdate={fetchKeys} showToast={showToast} />
-          <TradeForm keys={keys} onTrade={fetchData} showToast={showToast} />
+          <TradeForm keys={keys} prices={latestPrices} showToast={showToast} />
         </div>
       </main>
 
@@ -86,8 +86,8 @@ export const api = {
 
     // Market Data
     getMarketCurrent: () => axiosInstance.get(`/market/current`),
-    getMarketHistory: () => axiosInstance.get(`/market/history`),
-    getTrades: () => axiosInstance.get(`/trades`),
+    getMarketHistory: (params) => axiosInstance.get(`/market/history`, { params }),
+    getTrades: (params) => axiosInstance.get(`/trades`, { params }),
     getPrices: () => axiosInstance.get(`/prices`),
     getCoins: () => axiosInstance.get(`/coins`),
 
@@ -98,3 +98,16 @@ export const api = {
     trade: (data) => axiosInstance.post(`/trade`, data),
     getBalance: (keyId) => axiosInstance.get(`/balance/${keyId}`),
 };
+
+// Server-Sent Events push of new ticks and trades (replaces polling).
+// EventSource reconnects by itself; onOpen fires on every (re)connect so the
+// caller can re-sync anything missed while disconnected.
+export const subscribeMarketStream = ({ onOpen, onPrice, onTick, onBackfill, onTrade }) => {
+    const source = new EventSource(`${API_BASE_URL}/stream`);
+    source.onopen = () => onOpen && onOpen();
+    source.addEventListener('price', (event) => onPrice && onPrice(JSON.parse(event.data)));
+    source.addEventListener('tick', (event) => onTick && onTick(JSON.parse(event.data)));
+    source.addEventListener('backfill', (event) => onBackfill && onBackfill(JSON.parse(event.data)));
+    source.addEventListener('trade', (event) => onTrade && onTrade(JSON.parse(event.data)));
+    return source;
+};
@@ -3,12 +3,11 @@ import { api } from '../api';
 import { ArrowUpCircle, ArrowDownCircle, Wallet, TrendingUp } from 'lucide-react';
 import ConfirmModal from './ConfirmModal';
 
-const TradeForm = ({ keys, onTrade, showToast }) => {
+const TradeForm = ({ keys, prices, showToast }) => {
     const [selectedKey, setSelectedKey] = useState('');
     const [amount, setAmount] = useState(10000);
     const [loading, setLoading] = useState(false);
     const [balance, setBalance] = useState(null);
-    const [prices, setPrices] = useState(null);
     const [selectedCoin, setSelectedCoin] = useState('BTC');
     const [side, setSide] = useState('bid'); // 'bid' for buy, 'ask' for sell
     const [confirmModal, setConfirmModal] = useState({
@@ -29,9 +28,6 @@ const TradeForm = ({ keys, onTrade, showToast }) => {
             setBalance(null); // Reset balance on key change to prevent stale data
             fetchBalance();
         }
-        fetchPrices();
-        const interval = setInterval(fetchPrices, 5000);
-        return () => clearInterval(interval);
     }, [selectedKey]);
 
     const selectedKeyObj = keys.find(k => k.id == selectedKey);
@@ -50,15 +46,6 @@ const TradeForm = ({ keys, onTrade, showToast }) => {
         }
     };
 
-    const fetchPrices = async () => {
-        try {
-            const res = await api.getPrices();
-            setPrices(res.data);
-        } catch (error) {
-            console.error('Failed to fetch prices:', error);
-        }
-    };
-
     const getBalanceForCurrency = (currency) => {
         if (!balance) return 0;
         const account = balance.find(b => b.currency === currency);
@@ -68,9 +55,9 @@ const TradeForm = ({ keys, onTrade, showToast }) => {
     const getCoinPrice = (coin) => {
         if (!prices) return 0;
 
+        // prices is the latest pushed snapshot (/market/current shape)
         if (exchange === 'binance') {
-            if (!prices.binance) return 0;
-            return prices.binance[coin.toLowerCase()] || 0;
+            return prices[`${coin.toLowerCase()}_binance`] || 0;
         } else {
             // Bithumb
             const key = `${coin.toLowerCase()}_price`;
@@ -120,7 +107,7 @@ const TradeForm = ({ keys, onTrade, showToast }) => {
                 amount: parseFloat(amount),
                 coin: selectedCoin
             });
-            onTrade();
+            // The new trade arrives over the market stream
             fetchBalance(); // Immediate refresh
 
             // Delayed refresh for exchange latency